@@ -1,31 +1,49 @@
 from game import Game
+from layouts import LayoutCache
+from minimap import Minimap
 from player import Player
 from field import Field
+from renderer import Renderer
+from style import Style
+from storage import SaveWorker, AUTOSAVE_SLOT, load_game, new_slot, read_index
+from concurrent.futures import ThreadPoolExecutor
+import benchmark
+import contextlib
 import curses
-import os
-import pickle
+import loadgen
+import profiling
+import replay
+import server
+import simulate
 import sys
+import time
 
-SAVES_PATH = 'saves'
-SAVE_NAME = "last_save.pkl"
+AUTOSAVE_INTERVAL = 60  # seconds between autosaves
+FRAME_RATE = 30  # the game is redrawn at most that many times a second
+FRAME_INTERVAL = 1 / FRAME_RATE
+INPUT_TIMEOUT = 50  # milliseconds of waiting for a key when nothing has to be redrawn
+STR_THINKING = "AI is thinking..."
+STATS_WIDTH = len("| Size | Alive | Dead |")  # width of the tables of the stats
 
 
-def main(screen: curses.window, mheight: int, mwidth: int):
+def main(screen: curses.window, mheight: int, mwidth: int, seed=None):
     # removing cursor
     curses.curs_set(0)
     # setting color for menu
     curses.init_pair(1, curses.COLOR_BLACK, curses.COLOR_WHITE)
 
     # things to be printed
-    prev_game = load_game()
-
     str_start_game = "Start New Game"
     str_load_game = "Load Game"
     str_exit = "Exit"
-    menu_items = [str_load_game, str_start_game, str_exit] if prev_game else [str_start_game, str_exit]
+    # only the index of the saves is read, not the saves themselves
+    saves = read_index()
+    menu_items = [str_load_game, str_start_game, str_exit] if saves else [str_start_game, str_exit]
 
     cur_index = 0  # selected menu item
     display_menu(screen, menu_items, cur_index)
+    # layouts of the fleets are generated in the background while the games are played
+    layouts = LayoutCache()
 
     while True:
         # listen to input
@@ -41,27 +59,89 @@ def main(screen: curses.window, mheight: int, mwidth: int):
             cur_item = menu_items[cur_index]
 
             if cur_item == str_start_game:
-                # adjust length of the symbols
-                Field.recal_sybms(len(str(mwidth)))
                 # start new game
-                start_game(screen, mheight, mwidth)
+                start_game(screen, mheight, mwidth, seed, layouts)
+                # the games are placed from scratch while the cache doesn't work
+                error = layouts.take_error()
+                if error is not None:
+                    screen.clear()
+                    print_to_center(screen, ["Layouts of the fleets can't be cached:", str(error)])
+                    screen.refresh()
+                    screen.getch()
             elif cur_item == str_load_game:
-                # adjust length of the symbols
-                Field.recal_sybms(len(str(prev_game.map_width)))
-                # continue last saved game
-                play_game(screen, game=prev_game)
+                load_saved_game(screen, saves)
             elif cur_item == str_exit:
+                layouts.close()
                 return
 
+            # the played game might have been saved
+            saves = read_index()
+            menu_items = [str_load_game, str_start_game, str_exit] if saves else [str_start_game, str_exit]
+            cur_index = 0
+
         screen.clear()
         display_menu(screen, menu_items, cur_index)
 
 
-def start_game(screen: curses.window, mheight: int, mwidth: int) -> None:
+def describe_save(save) -> str:
+    """
+    returns the line describing the save in the list of saves
+    """
+    saved_at = time.strftime('%Y-%m-%d %H:%M', time.localtime(save['timestamp']))
+    my_ships, enemy_ships = save['ships_left']
+    # games which can't be repeated by a seed have none
+    seed = save.get('seed')
+    return f"{save['slot']}: {save['player']}, {save['height']}x{save['width']}, turn {save['turn']}, " \
+           f"ships {my_ships}/{enemy_ships}, seed {'-' if seed is None else seed}, {saved_at}"
+
+
+def load_saved_game(screen: curses.window, saves) -> None:
+    """
+    function for choosing a save from the list and continuing it
+    """
+    # the latest saves fitting on the screen are listed
+    sheight, _ = screen.getmaxyx()
+    saves = saves[:max(1, sheight - 10)]
+    menu_items = [describe_save(save) for save in saves] + ["Back"]
+    cur_index = 0
+
+    while True:
+        screen.clear()
+        display_menu(screen, menu_items, cur_index)
+        key = screen.getch()
+
+        if key == curses.KEY_UP and cur_index > 0:
+            cur_index -= 1
+        elif key == curses.KEY_DOWN and cur_index < len(menu_items) - 1:
+            cur_index += 1
+        elif key == curses.KEY_ENTER or key in [10, 13]:
+            if cur_index == len(saves):
+                return
+
+            slot = saves[cur_index]['slot']
+            try:
+                game = load_game(slot)
+            except ValueError:
+                # a corrupted save or a save of an unsupported version can't be continued
+                game = None
+            if game is None:
+                screen.clear()
+                print_to_center(screen, ["The save can't be loaded"])
+                screen.getch()
+                continue
+
+            # continue the saved game
+            play_game(screen, game=game, loaded_slot=slot)
+            return
+
+
+def start_game(screen: curses.window, mheight: int, mwidth: int, seed=None, layouts=None) -> None:
     """
     function for starting a new game
     mheight: map height
     mwidth: map width
+    seed: seed of the game, a random one if None
+    layouts: cache of the fleet layouts, it isn't used by the games with the given seed since they should repeat
     """
     # reading player's name
     screen.clear()
@@ -78,9 +158,10 @@ def start_game(screen: curses.window, mheight: int, mwidth: int) -> None:
     screen.refresh()
 
     # initializing a new game
-    game = Game(mheight, mwidth)
+    game = Game(mheight, mwidth, seed=seed)
     # making necessary preparations
-    game.prepare_game(player_name=name)
+    with profiling.timed('prepare_game'):
+        game.prepare_game(player_name=name, layouts=layouts if seed is None else None)
     # playing the game
     play_game(screen=screen, game=game)
 
@@ -98,189 +179,309 @@ def print_to_center(screen: curses.window, messages) -> None:
         screen.addstr(sheight // 2 + index, swidth // 2 - len(message) // 2, message)
 
 
-def display_game(screen: curses.window, cur_player: Player, game: Game):
+def display_game(renderer: Renderer, cur_player: Player, game: Game, status: str = ''):
     """
     function for printing game on the console
-    """
-    # obtain coordinates for displaying fields
-    sheight, swidth = screen.getmaxyx()
-    my_coords, enemy_coords = game.display_field(sheight=sheight, swidth=swidth)
-
-    # print fields and stats on the console
-    screen.clear()
-    display_field(screen, my_coords, cur_player, True, game=game)
-    display_field(screen, enemy_coords, cur_player, False, game=game)
-    stats = game.num_alive_ships()
-    display_stats(screen=screen, statistics=stats[0], my=True, game=game)
-    display_stats(screen=screen, statistics=stats[1], my=False, game=game)
-
 
-def process_shooting(screen: curses.window, cur_player: Player, game: Game, is_human: bool):
+    only the things changed since the previous frame are sent to the console,
+    status is printed in the bottom left corner
+    """
+    with profiling.timed('render'):
+        # obtain coordinates for displaying fields
+        sheight, swidth = renderer.getmaxyx()
+        my_coords, enemy_coords = game.display_field(sheight=sheight, swidth=swidth, style=renderer.style)
+
+        # everything is redrawn if the screen is resized or the sliding windows move
+        my_field, enemy_field = cur_player.my_field, cur_player.enemy_field
+        renderer.begin_frame(layout=(sheight, swidth, renderer.style.width,
+                                     my_field.border_top, my_field.border_left,
+                                     enemy_field.border_top, enemy_field.border_left))
+
+        # print fields and stats on the console
+        display_field(renderer, my_coords, cur_player, True, game=game)
+        display_field(renderer, enemy_coords, cur_player, False, game=game)
+        stats = game.num_alive_ships()
+        display_stats(screen=renderer, statistics=stats[0], my=True, game=game)
+        display_stats(screen=renderer, statistics=stats[1], my=False, game=game)
+        display_minimap(renderer, cur_player, game)
+        renderer.addstr(sheight - 1, 0, status.ljust(len(STR_THINKING)))
+
+        renderer.end_frame()
+
+
+def process_shooting(cur_player: Player, game: Game, is_human: bool):
     """
     function for processing current player's shot
+
+    returns lines of the message about the shot, None if the cell can't be shot.
+    The turn passes to the other player if the shot missed
     """
     # shoot
     succ, hit = game.player_shoot()
     # if player chose an inappropriate cell, do nothing
     if not succ:
-        game.turn -= 1
-    else:
-        screen.clear()
-
-        message = "You missed" if is_human else "AI missed"
-        if hit:
-            message = "You hit enemy ship" if is_human else "AI hit enemy ship"
-            game.check_victory()
-            game.turn -= 1
-
-        # printing the result of the shot to the screen
-        if is_human:
-            print_to_center(screen, [message])
-        else:
-            y_shot = cur_player.enemy_field.y_cur
-            x_shot = cur_player.enemy_field.x_cur
-            print_to_center(screen, [f"AI has shot to {y_shot} {x_shot}", message])
+        return None
 
-        screen.refresh()
-        screen.getch()
+    message = "You missed" if is_human else "AI missed"
+    if hit:
+        message = "You hit enemy ship" if is_human else "AI hit enemy ship"
+        game.check_victory()
+    else:
+        game.turn += 1
 
-    screen.refresh()
+    # the result of the shot is printed to the screen
+    if is_human:
+        return [message]
+    y_shot = cur_player.enemy_field.y_cur
+    x_shot = cur_player.enemy_field.x_cur
+    return [f"AI has shot to {y_shot} {x_shot}", message]
 
 
-def process_human_move(screen: curses.window, cur_player: Player, game: Game):
+def think(cur_player: Player, game: Game):
     """
-    function for listening to player's input and taking appropriate actions
-    """
-    buttons_move_cursor = [curses.KEY_UP, curses.KEY_DOWN, curses.KEY_LEFT, curses.KEY_RIGHT,
-                           ord('w'), ord('s'), ord('a'), ord('d')]
-
-    buttons_shoot = [curses.KEY_ENTER, 10, 12, 13, 14]
-
-    while True:
-        # get fields
-        my_field = cur_player.my_field
-        enemy_field = cur_player.enemy_field
+    function computing the AI's shot, it runs on the worker thread
 
-        display_game(screen, cur_player, game)
-
-        # listen to the input
-        key = screen.getch()
-        # move corresponding cursors
-        if key in buttons_move_cursor:
-            move_cursor(key, my_field=my_field, enemy_field=enemy_field, game=game)
-        # shoot at the current location of the cursor
-        elif key in buttons_shoot:
-            process_shooting(screen, cur_player, game, is_human=True)
-            break
-        # save the game
-        elif key == ord('o'):
-            screen.clear()
-            save_game(game)
-            print_to_center(screen, ['The game was saved'])
-            screen.getch()
-            game.turn -= 1
-            break
-
-
-def process_ai_move(screen: curses.window, cur_player: Player, game: Game):
-    """
-    function for simulating ai move
-    """
-    # get coordinates for shooting
-    y_shot, x_shot = cur_player.get_rand_shoot()
-    cur_player.enemy_field.y_cur = y_shot
-    cur_player.enemy_field.x_cur = x_shot
-
-    # shoot
-    process_shooting(screen, cur_player, game, is_human=False)
+    the AI only changes its own state, the fields shown to the human are changed by the shots
+    which are made by the game loop
+    """
+    with profiling.timed('ai_move'):
+        return cur_player.get_ai_shoot(game)
 
 
-def declare_winner(screen: curses.window, game: Game):
+def declare_winner(screen: curses.window, game: Game, save_error=None):
     """
     function for printing the winner to the screen
+
+    save_error: the error of writing a save, it's shown under the winner
     """
     screen.clear()
-    message = f'Congrats! Player {game.winner} has won!'
-    print_to_center(screen, [message])
+    message = [f'Congrats! Player {game.winner} has won!']
+    if save_error is not None:
+        message.append(f"The game wasn't saved: {save_error}")
+    print_to_center(screen, message)
     screen.refresh()
     screen.getch()
 
 
-def play_game(screen: curses.window, game: Game) -> None:
+def play_game(screen: curses.window, game: Game, loaded_slot=None) -> None:
     """
     function for simulating the game
-    """
 
-    while not game.is_finished:
-        # obtaining the current player
-        cur_player = game.players[game.turn % 2]
-        # if human
-        if cur_player.is_human:
-            process_human_move(screen, cur_player, game)
-            screen.refresh()
+    loaded_slot: the slot the game was loaded from, the game is saved to it,
+    autosaves and new games are saved to a new slot
 
-        # if current player is AI
-        else:
-            process_ai_move(screen, cur_player, game)
-            screen.refresh()
+    the loop never blocks: keys are read with a timeout, AI moves are computed on a worker thread
+    and the screen is redrawn at most FRAME_RATE times a second if something has changed.
+    So the fields can be scrolled while AI thinks, and AI thinks while the message about the previous
+    shot is shown. A message is shown instead of the fields until any key is pressed
+    """
+    # length of the symbols matches the length of the column numbers
+    renderer = Renderer(screen, Style.for_map(game.map_width))
+    # saves are appended to the journals on a background thread, the game only takes their snapshots
+    saver = SaveWorker(loaded_slot=loaded_slot)
+    slot = None if loaded_slot == AUTOSAVE_SLOT else loaded_slot
+    last_autosave = time.monotonic()
+    # the fields of the human are shown and scrolled whoever's turn it is
+    viewer = game.players[0]
+    thinker = ThreadPoolExecutor(max_workers=1)
+    ai_move = None  # future of the AI's shot
+    message = None  # lines shown instead of the fields
+    dirty = True  # the screen has to be redrawn
+    last_frame = 0.0
 
-        game.turn += 1
+    buttons_shoot = [curses.KEY_ENTER, 10, 12, 13, 14]
 
-    declare_winner(screen, game)
+    def save():
+        nonlocal slot
+        if slot is None:
+            slot = new_slot()
+        saver.submit(game, slot)
 
+    while not game.is_finished or message is not None:
+        # obtaining the current player
+        cur_player = game.players[game.turn % 2]
 
-def save_game(game):
+        if not game.is_finished and not cur_player.is_human:
+            # AI starts thinking as soon as its turn comes
+            if ai_move is None:
+                ai_move = thinker.submit(think, cur_player, game)
+            # its shot is made after the message about the previous one is dismissed
+            elif ai_move.done() and message is None:
+                cur_player.enemy_field.y_cur, cur_player.enemy_field.x_cur = ai_move.result()
+                ai_move = None
+                message = process_shooting(cur_player, game, is_human=False)
+                dirty = True
+
+        # a failed save is reported as soon as no other message is shown, its moves are saved with the next one
+        if message is None:
+            error = saver.take_error()
+            if error is not None:
+                message = [f"The game wasn't saved: {error}"]
+                dirty = True
+
+        # autosaves are taken between the shots, when AI doesn't think
+        if ai_move is None and not game.is_finished and time.monotonic() - last_autosave >= AUTOSAVE_INTERVAL:
+            saver.submit(game, AUTOSAVE_SLOT)
+            last_autosave = time.monotonic()
+
+        now = time.monotonic()
+        if dirty and now - last_frame >= FRAME_INTERVAL:
+            if message is not None:
+                screen.erase()
+                renderer.invalidate()
+                print_to_center(screen, message)
+                screen.refresh()
+            else:
+                display_game(renderer, viewer, game, status=STR_THINKING if ai_move is not None else '')
+            dirty = False
+            last_frame = now
+
+        # waiting for a key until the next frame is due, AI's shot is checked at least every INPUT_TIMEOUT
+        if dirty:
+            keys = read_keys(screen, max(1, int((last_frame + FRAME_INTERVAL - now) * 1000)))
+        else:
+            keys = read_keys(screen, INPUT_TIMEOUT)
+        if not keys:
+            continue
+
+        dirty = True
+        # the cursor moves of the keys in a row are summed up and made at once
+        moves = [0, 0, 0, 0]  # dy and dx of the cursors of the upper and the lower fields
+        for key in keys:
+            if game.is_finished and message is None:
+                break
+            move = cursor_move(key, game)
+            if move is not None and message is None:
+                for k, delta in enumerate(move):
+                    moves[k] += delta
+                continue
+            move_cursors(moves, my_field=viewer.my_field, enemy_field=viewer.enemy_field, game=game)
+            moves = [0, 0, 0, 0]
+
+            is_human_turn = game.players[game.turn % 2].is_human
+            enemy_field = viewer.enemy_field
+            # positions on the screen have to be recomputed
+            if key == curses.KEY_RESIZE:
+                viewer.my_field.invalidate_layout()
+                enemy_field.invalidate_layout()
+            # any key dismisses the message
+            elif message is not None:
+                message = None
+                renderer.invalidate()
+            # shoot at the current location of the cursor
+            elif key in buttons_shoot and is_human_turn:
+                message = process_shooting(game.players[game.turn % 2], game, is_human=True)
+            # save the game
+            elif key == ord('o') and is_human_turn:
+                save()
+                message = ['The game is being saved']
+            # jump to the cell typed by the player
+            elif key == ord('g'):
+                cell = read_cell(screen, game)
+                renderer.invalidate()
+                if cell is None:
+                    message = ['There is no such cell']
+                else:
+                    enemy_field.y_cur, enemy_field.x_cur = cell
+            # jump to the next cell which can be shot
+            elif key == ord('n'):
+                cell = enemy_field.next_shootable(enemy_field.y_cur, enemy_field.x_cur)
+                if cell is not None:
+                    enemy_field.y_cur, enemy_field.x_cur = cell
+            # jump to the next enemy ship which is hit but not destroyed
+            elif key == ord('h'):
+                cell = game.next_damaged(1, enemy_field.y_cur, enemy_field.x_cur)
+                if cell is None:
+                    message = ['There are no damaged enemy ships']
+                else:
+                    enemy_field.y_cur, enemy_field.x_cur = cell
+        move_cursors(moves, my_field=viewer.my_field, enemy_field=viewer.enemy_field, game=game)
+
+    # getch blocks again in the menus
+    screen.timeout(-1)
+    thinker.shutdown()
+    saver.close()
+    declare_winner(screen, game, saver.take_error())
+
+
+def read_keys(screen: curses.window, timeout: int):
     """
-    function for saving the game
+    returns the pressed keys, waits for the first one at most timeout milliseconds
 
-    save is located in ./save folder
+    a held key fills the input queue faster than the game is redrawn, so all the keys in the queue are taken
     """
+    screen.timeout(timeout)
+    keys = []
+    key = screen.getch()
+    while key != -1:
+        keys.append(key)
+        screen.timeout(0)
+        key = screen.getch()
+    return keys
 
-    if not os.path.exists(SAVES_PATH):
-        os.makedirs(SAVES_PATH)
-
-    with open(os.path.join(SAVES_PATH, SAVE_NAME), 'wb') as save:
-        pickle.dump(game, save, pickle.HIGHEST_PROTOCOL)
 
+def cursor_move(key, game: Game):
+    """
+    returns dy and dx of the cursors of the upper and the lower fields moved by the key,
+    None if the key doesn't move them
 
-def load_game():
+    Page Up and Page Down move the lower cursor by the window, Home and End move it to the ends of the row
     """
-    returns a saved game if any
+    moves = {
+        ord('w'): (-1, 0, 0, 0),
+        ord('s'): (1, 0, 0, 0),
+        ord('a'): (0, -1, 0, 0),
+        ord('d'): (0, 1, 0, 0),
+        curses.KEY_UP: (0, 0, -1, 0),
+        curses.KEY_DOWN: (0, 0, 1, 0),
+        curses.KEY_LEFT: (0, 0, 0, -1),
+        curses.KEY_RIGHT: (0, 0, 0, 1),
+        curses.KEY_PPAGE: (0, 0, -Field.WINDOW_HEIGHT, 0),
+        curses.KEY_NPAGE: (0, 0, Field.WINDOW_HEIGHT, 0),
+        curses.KEY_HOME: (0, 0, 0, -game.map_width),
+        curses.KEY_END: (0, 0, 0, game.map_width),
+    }
+    return moves.get(key)
+
+
+def move_cursors(moves, my_field, enemy_field, game):
     """
-
-    # check if the file exists
-    if not os.path.exists(os.path.join(SAVES_PATH, SAVE_NAME)):
-        return None
-
-    # load save
-    with open(os.path.join(SAVES_PATH, SAVE_NAME), 'rb') as load:
-        game = pickle.load(load)
-        return game
+    function for moving cursors on both fields by (dy, dx) of the upper field and (dy, dx) of the lower one,
+    the cursors stop at the edges of the map
+    """
+    for field, dy, dx in ((my_field, *moves[:2]), (enemy_field, *moves[2:])):
+        field.y_cur = min(max(field.y_cur + dy, 0), game.map_height - 1)
+        field.x_cur = min(max(field.x_cur + dx, 0), game.map_width - 1)
 
 
-def move_cursor(key, my_field, enemy_field, game):
+def read_cell(screen: curses.window, game: Game):
     """
-    function for moving cursors on both fields
+    function for reading the row and the column of a cell from the bottom line of the screen,
+    returns None if they aren't a cell of the map
     """
-    if key == curses.KEY_UP and enemy_field.y_cur - 1 >= 0:
-        enemy_field.y_cur -= 1
-    elif key == curses.KEY_DOWN and enemy_field.y_cur + 1 < game.map_height:
-        enemy_field.y_cur += 1
-    elif key == curses.KEY_LEFT and enemy_field.x_cur - 1 >= 0:
-        enemy_field.x_cur -= 1
-    elif key == curses.KEY_RIGHT and enemy_field.x_cur + 1 < game.map_width:
-        enemy_field.x_cur += 1
-    elif key == ord('w') and my_field.y_cur - 1 >= 0:
-        my_field.y_cur -= 1
-    elif key == ord('s') and my_field.y_cur + 1 < game.map_height:
-        my_field.y_cur += 1
-    elif key == ord('a') and my_field.x_cur - 1 >= 0:
-        my_field.x_cur -= 1
-    elif key == ord('d') and my_field.x_cur + 1 < game.map_width:
-        my_field.x_cur += 1
+    sheight, _ = screen.getmaxyx()
+    prompt = "Go to row,col: "
+    screen.move(sheight - 1, 0)
+    screen.clrtoeol()
+    screen.addstr(sheight - 1, 0, prompt)
+    # the prompt waits for the whole line
+    screen.timeout(-1)
+    curses.curs_set(1)
+    curses.echo()
+    text = screen.getstr(sheight - 1, len(prompt), 24).decode("utf-8")
+    curses.curs_set(0)
+    curses.noecho()
+
+    try:
+        y, x = (int(number) for number in text.replace(',', ' ').split())
+    except ValueError:
+        return None
+    if not (0 <= y < game.map_height and 0 <= x < game.map_width):
+        return None
+    return y, x
 
 
-def display_stats(screen: curses.window, statistics, my: bool, game: Game):
+def display_stats(screen: Renderer, statistics, my: bool, game: Game):
     """
     function for printing a table displaying how many ships are alive/dead
     """
@@ -300,12 +501,13 @@ def display_stats(screen: curses.window, statistics, my: bool, game: Game):
     offset_x = 0
 
     # Each table is 8 blocks away from fields
+    symbol_width = screen.style.width
     if my:
-        offset_x = swidth // 2 - Field.WINDOW_WIDTH * len(Field.EMPTY) // 2 \
+        offset_x = swidth // 2 - Field.WINDOW_WIDTH * symbol_width // 2 \
                    - len(str(game.map_width)) - len(col_names) - 8
     else:
-        offset_x = swidth // 2 - Field.WINDOW_WIDTH * len(Field.EMPTY) // 2 \
-                   + (len(Field.EMPTY) + 1) * Field.WINDOW_WIDTH + 8
+        offset_x = swidth // 2 - Field.WINDOW_WIDTH * symbol_width // 2 \
+                   + (symbol_width + 1) * Field.WINDOW_WIDTH + 8
 
     # Each table close to the middle of the fields but at least 1 block away from the top of the console
     offset_y = max(1, (Field.WINDOW_HEIGHT * 2 + 10) // 2 - (len(statistics) + 3) // 2)
@@ -334,39 +536,48 @@ def display_stats(screen: curses.window, statistics, my: bool, game: Game):
     screen.addstr(offset_y + row, offset_x, "-" * (len(col_names)))
 
 
-def display_field(screen: curses.window, coords, player: Player, my: bool, game: Game) -> None:
+def display_minimap(screen: Renderer, player: Player, game: Game) -> None:
+    """
+    function for printing the whole enemy field downsampled to the columns on the right of the stats,
+    it isn't printed if they are too narrow
+    """
+    sheight, swidth = screen.getmaxyx()
+    symbol_width = screen.style.width
+    left = swidth // 2 - Field.WINDOW_WIDTH * symbol_width // 2 + (symbol_width + 1) * Field.WINDOW_WIDTH + 2
+    if game.longest_ship_sz <= 50:
+        left += 6 + STATS_WIDTH
+    # the frame takes two rows and two columns, the bottom line is left for the status
+    grid = Minimap.fit(game.map_height, game.map_width, sheight - 4, swidth - left - 3)
+    if grid is None:
+        player.minimap = None
+        return
+
+    # the counters are built again only if the grid has changed
+    minimap = player.minimap
+    if minimap is None or (minimap.rows, minimap.columns) != grid:
+        minimap = player.minimap = Minimap(player.enemy_field, *grid)
+
+    screen.addstr(1, left, '+' + '-' * minimap.columns + '+')
+    for row, line in enumerate(minimap.lines(player.enemy_field.y_cur, player.enemy_field.x_cur), 2):
+        screen.addstr(row, left, '|' + line + '|')
+    screen.addstr(minimap.rows + 2, left, '+' + '-' * minimap.columns + '+')
+
+
+def display_field(screen: Renderer, coords, player: Player, my: bool, game: Game) -> None:
     """
     function for printing fields on the console
     """
     # obtaining field
     field = player.my_field if my else player.enemy_field
-    # obtaining sliding window borders
-    start_left = field.border_left
-    start_top = field.border_top
-    iter_row = start_top
-    iter_col = start_left
+    # position of the cursor on the screen
+    cursor = field.layout.screen_position(field.y_cur, field.x_cur)
     for y, x, symb in coords:
         # replacing current active element with the cursor
-        if iter_row == field.y_cur and iter_col == field.x_cur:
-            screen.addstr(y, x, Field.CURSOR)
-        else:
-            screen.addstr(y, x, symb)
-        # printing numbers on the top of the sliding window
-        if iter_row == start_top:
-            num_zeros = len(str(game.map_width)) - len(str(iter_col))
-            power_of_ten = 10 ** len(str(game.map_width))
-            screen.addstr(y - 1, x,
-                          "0" * num_zeros + str(iter_col) + " " if iter_col < power_of_ten else str(iter_col) + ' ')
-        # printing numbers on the left of the sliding window
-        if iter_col == start_left:
-            screen.addstr(y, x - len(str(iter_row)), str(iter_row))
-
-        iter_col += 1
-        if iter_col == start_left + Field.WINDOW_WIDTH:
-            iter_col = start_left
-            iter_row += 1
+        screen.addstr(y, x, screen.style.cursor if (y, x) == cursor else symb)
 
-    screen.refresh()
+    # printing numbers on the top and on the left of the sliding window
+    for y, x, label in field.layout.labels:
+        screen.addstr(y, x, label)
 
 
 def display_menu(screen: curses.window, menu_items, cur_index: int):
@@ -406,32 +617,62 @@ def read_args():
     """
     function for reading arguments
 
-    returns
+    returns if they are correct, height and width of the field, the seed of the game (None if not given)
+    and the profiling options: None if the session isn't profiled, otherwise (JSON file, cProfile file),
+    the summary is printed if the JSON file is None
     """
 
     try:
-        if len(sys.argv) != 3:
+        if len(sys.argv) < 3:
             raise UserException("Incorrect arguments")
 
-        n = int(sys.argv[1])
-        k = int(sys.argv[2])
+        # options with values, --profile has none
+        values = {'--seed': None, '--profile-out': None, '--cprofile': None}
+        profile = False
+        options = sys.argv[3:]
+        try:
+            n = int(sys.argv[1])
+            k = int(sys.argv[2])
+            while options:
+                option = options.pop(0)
+                if option == '--profile':
+                    profile = True
+                elif option in values and options:
+                    values[option] = options.pop(0)
+                else:
+                    raise UserException("Incorrect arguments")
+            seed = int(values['--seed']) if values['--seed'] is not None else None
+        except ValueError:
+            raise UserException("Incorrect arguments")
 
         if n < 5 or k < 5:
             raise UserException("Incorrect arguments")
 
-        return True, n, k
+        out, cprofile = values['--profile-out'], values['--cprofile']
+        return True, n, k, seed, (out, cprofile) if profile or out or cprofile else None
     except UserException as e:
         print(e.msg)
-        print("Please, run 'python3 battleships N K'")
-        print("where N >= 5 is height of the field and K >= 5 is its width")
-        return False, 0, 0
+        print("Please, run 'python3 battleships N K [--seed S] [--profile] [--profile-out FILE] [--cprofile FILE]'")
+        print("where N >= 5 is height of the field and K >= 5 is its width,")
+        print("games started with the same seed S place the ships and make AI moves the same way,")
+        print("--profile prints counters and timings of the session on exit, --profile-out writes them as JSON,")
+        print("--cprofile writes stats of cProfile")
+        return False, 0, 0, None, None
 
 
 if __name__ == '__main__':
-    succ, map_height, map_width = read_args()
+    # commands running without curses
+    commands = {'simulate': simulate.main, 'bench': benchmark.main, 'replay': replay.main,
+                'serve': server.main, 'loadgen': loadgen.main}
+    if len(sys.argv) > 1 and sys.argv[1] in commands:
+        sys.exit(commands[sys.argv[1]](sys.argv[2:]))
+
+    succ, map_height, map_width, seed, profile = read_args()
     if succ:
-        try:
-            curses.wrapper(main, map_height, map_width)
-        except curses.error:
-            print("Console size is too small")
-            print("Please, make it full screen")
+        # the summary is printed after curses gives the console back
+        with profiling.session(*profile) if profile else contextlib.nullcontext():
+            try:
+                curses.wrapper(main, map_height, map_width, seed)
+            except curses.error:
+                print("Console size is too small")
+                print("Please, make it full screen")
@@ -0,0 +1,135 @@
+from collections import deque
+from field import Field
+from shootable import ShootableIndex
+
+DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+class RandomStrategy:
+    """
+    shoots at random cells
+    """
+    NAME = 'random'
+
+    def next_shot(self, player, game):
+        return player.get_rand_shoot()
+
+
+class HuntTargetStrategy:
+    """
+    hunts for ships on a checkerboard and finishes off the damaged ones
+
+    hunt: shoots at random cells with (y + x) % n == offset where n is the size of the
+    smallest enemy ship still alive, any ship covers at least one of those cells.
+    target: after a hit the cells around it are queued, cells continuing a line of hits
+    are tried first and cells across a known line are skipped.
+
+    queued and checkerboard cells are dropped lazily once they can't be shot,
+    every cell is dropped at most once, so a move costs amortized O(1)
+    """
+    NAME = 'hunt'
+    SPARSE_TRIES = 100  # random cells of a sparse field tried to find a checkerboard one
+
+    def __init__(self):
+        self.frontier = None  # queued cells (y, x, y_hit, x_hit) next to the hits
+        self.last_shot = None
+        self.parity = 1  # size of the smallest enemy ship alive
+        self.checkerboard = None  # shootable cells of the checkerboard, built for parity > 1
+        self.offset = 0  # (y + x) % parity of the cells of the checkerboard
+
+    def _init_frontier(self, field) -> None:
+        """
+        queues cells around the hits made before (e.g. in a loaded game)
+        """
+        self.frontier = deque()
+        for cell in field.shot_cells(Field.STATE_SHOT_HIT):
+            self._on_hit(field, *divmod(cell, field.width))
+
+    def _on_hit(self, field, y: int, x: int) -> None:
+        for dy, dx in DIRECTIONS:
+            ny, nx = y + dy, x + dx
+            if not (0 <= ny < field.height and 0 <= nx < field.width) or not field.shootable(ny, nx):
+                continue
+            # the cell continues a line of hits
+            if 0 <= y - dy < field.height and 0 <= x - dx < field.width \
+                    and field.state(y - dy, x - dx) == Field.STATE_SHOT_HIT:
+                self.frontier.appendleft((ny, nx, y, x))
+            else:
+                self.frontier.append((ny, nx, y, x))
+
+    @staticmethod
+    def _across_line(field, y: int, x: int, y_hit: int, x_hit: int) -> bool:
+        """
+        checks if the hit is a part of a line going across the direction to the cell
+
+        ships don't touch each other, so such cell can't have a ship
+        """
+        dy, dx = x - x_hit, y - y_hit  # perpendicular direction
+        for sign in (-1, 1):
+            ny, nx = y_hit + sign * dy, x_hit + sign * dx
+            if 0 <= ny < field.height and 0 <= nx < field.width and field.state(ny, nx) == Field.STATE_SHOT_HIT:
+                return True
+        return False
+
+    @staticmethod
+    def _is_closed(field, y: int, x: int) -> bool:
+        for dy, dx in DIRECTIONS:
+            if 0 <= y + dy < field.height and 0 <= x + dx < field.width and field.shootable(y + dy, x + dx):
+                return False
+        return True
+
+    def _update_parity(self, player, game) -> None:
+        """
+        the checkerboard is rebuilt once the smallest enemy ship becomes bigger
+        """
+        stats = game.num_alive_ships()[1 - game.players.index(player)]
+        parity = next((size for size, alive in enumerate(stats, 1) if alive), 1)
+        if parity == self.parity:
+            return
+
+        self.parity = parity
+        field = player.enemy_field
+        self.offset = offset = player.rng.randrange(parity)
+        # cells of a sparse field are drawn at random instead
+        if field.is_sparse:
+            return
+        cells = [cell for y in range(field.height)
+                 for cell in range(y * field.width + (offset - y) % parity, (y + 1) * field.width, parity)
+                 if field.states[cell] == Field.STATE_EMPTY]
+        self.checkerboard = ShootableIndex(field.height * field.width, cells)
+
+    def _target(self, field):
+        while self.frontier:
+            y, x, y_hit, x_hit = self.frontier.popleft()
+            if field.shootable(y, x) and not self._across_line(field, y, x, y_hit, x_hit):
+                return y, x
+        return None
+
+    def _hunt(self, player):
+        field = player.enemy_field
+        if field.is_sparse:
+            return field.random_shootable(player.rng, self.parity, self.offset, tries=self.SPARSE_TRIES) \
+                   or player.get_rand_shoot()
+        while self.checkerboard is not None and len(self.checkerboard):
+            cell = self.checkerboard.choice(player.rng)
+            if field.states[cell] == Field.STATE_EMPTY:
+                return divmod(cell, field.width)
+            self.checkerboard.discard(cell)
+        return player.get_rand_shoot()
+
+    def next_shot(self, player, game):
+        field = player.enemy_field
+        if self.frontier is None:
+            self._init_frontier(field)
+            self._update_parity(player, game)
+        elif self.last_shot is not None and field.state(*self.last_shot) == Field.STATE_SHOT_HIT:
+            self._on_hit(field, *self.last_shot)
+            # once a ship is sunk its surrounding is marked, so nothing around the last hit can be shot
+            if self._is_closed(field, *self.last_shot):
+                self._update_parity(player, game)
+
+        self.last_shot = self._target(field) or self._hunt(player)
+        return self.last_shot
+
+
+STRATEGIES = {strategy.NAME: strategy for strategy in (RandomStrategy, HuntTargetStrategy)}
@@ -0,0 +1,223 @@
+from collections import deque
+from field import Field
+from game import Game
+from placement import TilePlacer
+from storage import save_game, load_game
+from style import Style
+import argparse
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+
+SIZES = (10, 100, 500, 1000, 2000)
+SEED = 2021
+MIN_TIME = 0.2  # seconds spent measuring a benchmark at least
+SHOTS = 1000  # shots made while measuring shooting
+MANY_GAMES = 200  # games sharing the process in bench_many_games
+MANY_GAMES_SIZE = 100  # the largest field of those games
+
+
+def _measure(func, min_time: float = MIN_TIME, max_runs: int = 10 ** 5):
+    """
+    returns average time of one call of func
+    """
+    spent = 0.0
+    runs = 0
+    while spent < min_time and runs < max_runs:
+        start = time.perf_counter()
+        func()
+        spent += time.perf_counter() - start
+        runs += 1
+    return spent / runs
+
+
+def _new_game(size: int) -> Game:
+    game = Game(size, size, seed=SEED + size)
+    game.prepare_game(player_name="bench", player_strategy='random')
+    return game
+
+
+def bench_placement(size: int) -> float:
+    game = _new_game(size)
+    player = game.players[0]
+    return _measure(lambda: player.set_and_fill_field(field=Field(size, size)), max_runs=20)
+
+
+def bench_tile_placement(size: int) -> float:
+    # fleets of both players are placed at once, the tiles are placed by worker processes
+    game = _new_game(size)
+    return _measure(lambda: TilePlacer(rng=game.rng).place([(Field(size, size), player.ships)
+                                                            for player in game.players]), max_runs=20)
+
+
+def bench_player_shoot(size: int) -> float:
+    game = _new_game(size)
+    player = game.players[0]
+    shots = min(SHOTS, size * size // 2)
+
+    spent = 0.0
+    for _ in range(shots):
+        # the cell is picked before measuring
+        game.turn = 0
+        player.enemy_field.y_cur, player.enemy_field.x_cur = player.get_rand_shoot()
+        start = time.perf_counter()
+        game.player_shoot()
+        spent += time.perf_counter() - start
+    return spent / shots
+
+
+def bench_get_rand_shoot(size: int) -> float:
+    game = _new_game(size)
+    player = game.players[0]
+    player.get_rand_shoot()  # the index is built on the first call
+    return _measure(player.get_rand_shoot)
+
+
+def bench_display_field(size: int) -> float:
+    game = _new_game(size)
+    field = game.players[0].my_field
+    field.y_cur = field.x_cur = size // 2
+    style = Style.for_map(size)
+    return _measure(lambda: deque(field.display_field(sheight=50, swidth=160, on_top=True, style=style), maxlen=0))
+
+
+def bench_num_alive_ships(size: int) -> float:
+    game = _new_game(size)
+    return _measure(game.num_alive_ships)
+
+
+def bench_many_games(size: int) -> float:
+    # games of different sizes up to the given one are played in one process at once,
+    # a round makes a move in every game and draws its window with its own style
+    sides = range(5, min(size, MANY_GAMES_SIZE) + 1)
+    games = []
+    for i in range(MANY_GAMES):
+        game = Game(sides[i % len(sides)], sides[i * 7 % len(sides)], seed=SEED + i)
+        game.prepare_game(player_name="bench", player_strategy='random')
+        games.append((game, Style.for_map(game.map_width)))
+
+    def round_of_moves():
+        for game, style in games:
+            if not game.is_finished:
+                _, hit = game.ai_shoot()
+                if hit:
+                    game.check_victory()
+                else:
+                    game.turn += 1
+            deque(game.display_field(sheight=50, swidth=160, style=style)[1], maxlen=0)
+
+    round_of_moves()  # indexes of the cells and layouts are built on the first round
+    return _measure(round_of_moves, max_runs=100)
+
+
+def bench_save_load(size: int) -> float:
+    game = _new_game(size)
+    with tempfile.TemporaryDirectory() as directory:
+        def round_trip():
+            save_game(game, 'bench', directory)
+            load_game('bench', directory)
+
+        return _measure(round_trip, max_runs=20)
+
+
+BENCHMARKS = {
+    'placement': bench_placement,
+    'tile_placement': bench_tile_placement,
+    'player_shoot': bench_player_shoot,
+    'get_rand_shoot': bench_get_rand_shoot,
+    'display_field': bench_display_field,
+    'num_alive_ships': bench_num_alive_ships,
+    'many_games': bench_many_games,
+    'save_load': bench_save_load,
+}
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes, names, log=print):
+    """
+    runs the benchmarks and returns their results, seconds per call
+    """
+    results = {name: {} for name in names}
+    for size in sizes:
+        for name in names:
+            results[name][f'{size}x{size}'] = seconds = BENCHMARKS[name](size)
+            log(f'{name:<16} {size}x{size:<10} {_format(seconds)}')
+
+    return {
+        'meta': {
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        },
+        'results': results,
+    }
+
+
+def _format(seconds: float) -> str:
+    for unit, scale in (('s', 1), ('ms', 1e-3), ('us', 1e-6)):
+        if seconds >= scale:
+            return f'{seconds / scale:.2f} {unit}'
+    return f'{seconds / 1e-9:.0f} ns'
+
+
+def compare(old, new, threshold: float) -> bool:
+    """
+    prints the table comparing two runs, returns True if there are regressions
+    """
+    print(f"old: {old['meta'].get('commit')}  new: {new['meta'].get('commit')}")
+    print(f"{'benchmark':<16} {'size':<10} {'old':>10} {'new':>10} {'change':>8}")
+
+    regressed = False
+    for name, sizes in new['results'].items():
+        for size, seconds in sizes.items():
+            before = old['results'].get(name, {}).get(size)
+            if before is None:
+                print(f'{name:<16} {size:<10} {"-":>10} {_format(seconds):>10}')
+                continue
+            change = (seconds - before) / before * 100
+            mark = ''
+            if change > threshold:
+                mark = '  REGRESSION'
+                regressed = True
+            print(f'{name:<16} {size:<10} {_format(before):>10} {_format(seconds):>10} {change:>+7.1f}%{mark}')
+
+    return regressed
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(prog='battleships bench', description="measures performance of the game")
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)),
+                        help="comma separated sizes of square fields")
+    parser.add_argument('--only', default=','.join(BENCHMARKS), help="comma separated benchmarks to run")
+    parser.add_argument('--out', default='bench.json', help="file to write results to")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="compare two result files")
+    parser.add_argument('--threshold', type=float, default=10.0, help="slowdown in percent reported as regression")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as old, open(args.compare[1]) as new:
+            return int(compare(json.load(old), json.load(new), args.threshold))
+
+    names = args.only.split(',')
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+    sizes = [int(size) for size in args.sizes.split(',')]
+    if any(size < 5 for size in sizes):
+        parser.error("sizes should be at least 5")
+
+    results = run(sizes, names)
+    with open(args.out, 'w') as out:
+        json.dump(results, out, indent=2)
+    print(f'results are written to {args.out}')
+    return 0
@@ -1,86 +1,253 @@
+from array import array
+from bisect import bisect_right
+from ship import Fleet
+import profiling
 
-class Cell:
-    def __init__(self, exists: bool):
-        self.symbol = Field.EMPTY if exists else Field.DOESNT_EXIST
-        self.ship = None
 
-    def set_ship(self, ship):
-        """
-        setting a ship
-        """
-        self.ship = ship
-        self.symbol = Field.SHIP
+class Layout:
+    """
+    positions of the sliding window's cells and labels on the screen
+
+    it's computed once for a screen size, a symbol width and a position of the window
+    """
 
-    def shootable(self) -> bool:
-        return self.symbol == Field.EMPTY
+    def __init__(self, field, key, swidth: int, on_top: bool, symbol_width: int):
+        self.key = key
+        left = swidth // 2 - Field.WINDOW_WIDTH * symbol_width // 2
+        top = 3 if on_top else 17
+        # widest column number, shorter ones are padded with zeros
+        label_width = len(str(field.width))
 
-    def get_shot(self, has_ship: bool):
+        self.cells = []  # (y, x, index of the cell in the field or -1 if it doesn't exist)
+        self.labels = []  # (y, x, text) of the numbers on the edges of the window
+        self.positions = {}  # (row, column) of the field -> (y, x) on the screen
+        for row_count, i in enumerate(range(field.border_top, field.border_top + Field.WINDOW_HEIGHT)):
+            y = top + row_count
+            self.labels.append((y, left - len(str(i)), str(i)))
+            for col_count, j in enumerate(range(field.border_left, field.border_left + Field.WINDOW_WIDTH)):
+                x = left + (symbol_width + 1) * col_count
+                exists = i < field.height and j < field.width
+                self.cells.append((y, x, i * field.width + j if exists else -1))
+                self.positions[(i, j)] = (y, x)
+                if row_count == 0:
+                    self.labels.append((y - 1, x, str(j).zfill(label_width) + ' '))
+
+    def screen_position(self, y: int, x: int):
         """
-        method changes the symbol of the cell
+        returns position of the field's cell on the screen, None if it's out of the window
         """
-        self.symbol = Field.SHOT_HIT if has_ship else Field.SHOT_MISS
+        return self.positions.get((y, x))
 
 
 class Field:
-    EMPTY = '   '
-    DOESNT_EXIST = '/' * len(EMPTY)
-    SHIP = '▩' * len(EMPTY)
-    CURSOR = '□' * len(EMPTY)
-    SHOT_MISS = '⊙'
-    SHOT_HIT = '⚔'
     WINDOW_HEIGHT = 10
     WINDOW_WIDTH = 10
 
-    @staticmethod
-    def recal_sybms(n: int):
+    # states of the cells, one byte per cell
+    STATE_EMPTY = 0
+    STATE_SHIP = 1
+    STATE_SHOT_MISS = 2
+    STATE_SHOT_HIT = 3
+    STATE_DOESNT_EXIST = 4
+
+    NO_SHIP = -1  # ship id of the cells without a ship
+    SPARSE_CELLS = 10 ** 7  # fields with more cells store only their ships and shots
+
+    is_sparse = False
+
+    def __init__(self, height, width, states=None, ship_ids=None):
         """
-        method for adjusting length of the symbols to match cursors length
+        states and ship ids of the cells may be given, e.g. mapped from a save
         """
-        Field.EMPTY = ' ' * n
-        Field.DOESNT_EXIST = '/' * n
-        Field.SHIP = '▩' * n
-        Field.CURSOR = '□' * n
-        Field.SHOT_MISS = ' ' * (n // 2) + '⊙'
-        Field.SHOT_HIT = ' ' * (n // 2) + '⚔'
-
-    def __init__(self, height, width):
         self.height = height  # map height
         self.width = width  # map width
-        self.cells = []
-        self._init_cells()
+        # state of every cell, row by row
+        self.states = bytearray(height * width) if states is None else states
+        # id of the ship on every cell, allocated when it's first needed (see __getattr__)
+        if ship_ids is not None:
+            self.ship_ids = ship_ids
+        self.ships = Fleet()  # placed ships, indexed by their ids
         self.border_left = 0  # the left-most column of the sliding window
         self.border_top = 0  # the top-most column of the sliding window
         self.x_cur = self.y_cur = 0  # current active cell
+        self.layout = None  # cached positions of the sliding window on the screen
+        self.full_rows = None  # 1 for the rows found to have no cells that can be shot, see next_shootable
 
-    def _init_cells(self) -> None:
+    def __getattr__(self, name: str):
+        # a field without ships, e.g. enemy's field, never allocates its ship ids
+        if name == 'ship_ids' and not self.is_sparse:
+            self.ship_ids = array('i', [Field.NO_SHIP]) * (self.height * self.width)
+            return self.ship_ids
+        raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+
+    def clear_cells(self) -> None:
         """
-        setting cells
+        clearing cells
 
-        field's sliding window size is at least WINDOW_HEIGHT x WINDOW_WIDTH
+        the storage is reused, nothing is reallocated
         """
-        for i in range(self.height):
-            row = []
-            for j in range(self.width):
-                row.append(Cell(exists=True))
-            for j in range(self.width, Field.WINDOW_WIDTH):
-                row.append(Cell(exists=False))
+        self.states[:] = bytes(len(self.states))
+        self.full_rows = None
+        for ship in self.ships:
+            for y, x in ship.cells():
+                self.ship_ids[y * self.width + x] = Field.NO_SHIP
+        self.ships = Fleet()
 
-            self.cells.append(row)
+    def state(self, y: int, x: int) -> int:
+        """
+        returns state of the cell
 
-        for i in range(self.height, Field.WINDOW_HEIGHT):
-            self.cells.append([Cell(exists=False) for _ in range(max(self.width, 10))])
+        field's sliding window size is at least WINDOW_HEIGHT x WINDOW_WIDTH,
+        cells outside of the map do not exist
+        """
+        if y >= self.height or x >= self.width:
+            return Field.STATE_DOESNT_EXIST
+        return self.states[y * self.width + x]
 
-    def clear_cells(self) -> None:
+    def shootable(self, y: int, x: int) -> bool:
+        return self.state(y, x) == Field.STATE_EMPTY
+
+    def has_ship(self, y: int, x: int) -> bool:
+        return self.ship_ids[y * self.width + x] != Field.NO_SHIP
+
+    def ship_id(self, y: int, x: int) -> int:
         """
-        clearing cells
+        returns id of the ship located on the cell, NO_SHIP if there is none
+        """
+        return self.ship_ids[y * self.width + x]
+
+    def ship_at(self, y: int, x: int):
+        """
+        returns view of the ship located on the cell if any
         """
-        self.cells = []
-        self._init_cells()
+        ship_id = self.ship_ids[y * self.width + x]
+        return self.ships[ship_id] if ship_id != Field.NO_SHIP else None
+
+    def place_ship(self, ship, y: int, x: int, is_vertical: bool) -> None:
+        """
+        setting a ship with its head at (y, x)
+
+        the size and the health of the ship are copied to the field's fleet, the ship itself isn't changed
+        """
+        size = ship.size
+        ship_id = self.ships.add(size, y, x, is_vertical, ship.health)
+        # cells of the ship form a slice of the row-major storage
+        start = y * self.width + x
+        step = self.width if is_vertical else 1
+        cells = slice(start, start + size * step, step)
+        self.ship_ids[cells] = array('i', [ship_id]) * size
+        self.states[cells] = bytes([Field.STATE_SHIP]) * size
+
+    def restore_ship(self, ship, y: int, x: int, is_vertical: bool) -> None:
+        """
+        adds a ship whose cells are already marked in the states and ship ids
+        """
+        self.ships.add(ship.size, y, x, is_vertical, ship.health)
+
+    def halo(self, ship_id: int):
+        """
+        returns ranges of the cells (y * width + x) around the ship which are on the field
+
+        every ship is destroyed once, so the ranges aren't kept
+        """
+        fleet = self.ships
+        width = self.width
+        y, x, size = fleet.ys[ship_id], fleet.xs[ship_id], fleet.sizes[ship_id]
+        halo = []
+        if fleet.vertical[ship_id]:
+            top, bottom = max(0, y - 1), min(self.height - 1, y + size)
+            # the columns at both sides, the cells above and below the ship
+            if x > 0:
+                halo.append(range(top * width + x - 1, bottom * width + x, width))
+            if x + 1 < width:
+                halo.append(range(top * width + x + 1, bottom * width + x + 2, width))
+            if y > 0:
+                halo.append(range((y - 1) * width + x, (y - 1) * width + x + 1))
+            if y + size < self.height:
+                halo.append(range((y + size) * width + x, (y + size) * width + x + 1))
+        else:
+            left, right = max(0, x - 1), min(width - 1, x + size)
+            # the rows above and below, the cells at both ends of the ship
+            if y > 0:
+                halo.append(range((y - 1) * width + left, (y - 1) * width + right + 1))
+            if y + 1 < self.height:
+                halo.append(range((y + 1) * width + left, (y + 1) * width + right + 1))
+            if x > 0:
+                halo.append(range(y * width + x - 1, y * width + x))
+            if x + size < width:
+                halo.append(range(y * width + x + size, y * width + x + size + 1))
+        return halo
+
+    def get_shot(self, y: int, x: int, has_ship: bool) -> None:
+        """
+        method changes the state of the cell
+        """
+        self.states[y * self.width + x] = Field.STATE_SHOT_HIT if has_ship else Field.STATE_SHOT_MISS
+
+    def mark_halo(self, halo) -> None:
+        """
+        marks the cells around a destroyed ship as missed, a range at a time
+        """
+        for cells in halo:
+            self.states[cells.start:cells.stop:cells.step] = bytes([Field.STATE_SHOT_MISS]) * len(cells)
+
+    def shot_cells(self, state: int):
+        """
+        returns cells (y * width + x) in the state of a shot
+        """
+        cells = []
+        # mapped states find only bytes
+        target = bytes([state])
+        cell = self.states.find(target)
+        while cell != -1:
+            cells.append(cell)
+            cell = self.states.find(target, cell + 1)
+        return cells
+
+    def next_shootable(self, y: int, x: int):
+        """
+        returns the first cell after (y, x) row by row that can be shot, None if there is no such cell
+
+        the search goes on from the top of the field after the last cell. Cells are only shot, so a row
+        found to have no cells that can be shot is remembered and skipped with one find over the rows
+        """
+        if self.full_rows is None:
+            self.full_rows = bytearray(self.height)
+        row, start = y, x + 1
+        while True:
+            if not self.full_rows[row]:
+                column = self._shootable_in_row(row, start)
+                if column is not None:
+                    return row, column
+                if start == 0:
+                    self.full_rows[row] = 1
+            # the next row which may have cells that can be shot
+            row = self.full_rows.find(0, row + 1)
+            if row == -1:
+                row = self.full_rows.find(0)
+                if row == -1:
+                    return None
+            start = 0
+
+    def _shootable_in_row(self, y: int, start: int):
+        """
+        returns the first column from start of the row whose cell can be shot, None if there is none
+        """
+        cell = self.states.find(bytes([Field.STATE_EMPTY]), y * self.width + start, (y + 1) * self.width)
+        return None if cell == -1 else cell - y * self.width
+
+    def invalidate_layout(self) -> None:
+        """
+        the window's positions will be recomputed, e.g. after the terminal was resized
+        """
+        self.layout = None
 
     def _adjust_borders(self):
         """
         method for acquiring numbers on the edges of the sliding window
         """
+        borders = self.border_top, self.border_left
+
         if self.x_cur < self.border_left:
             self.border_left = self.x_cur
         elif abs(self.x_cur - self.border_left) + 1 > Field.WINDOW_WIDTH:
@@ -91,36 +258,148 @@ class Field:
         if abs(self.y_cur - self.border_top) + 1 > Field.WINDOW_HEIGHT:
             self.border_top = self.y_cur - Field.WINDOW_HEIGHT + 1
 
-    def display_field(self, sheight, swidth, on_top: bool):
+        # the window has moved
+        if borders != (self.border_top, self.border_left):
+            self.layout = None
+
+    def display_field(self, sheight, swidth, on_top: bool, style):
         """
         method for displaying sliding window on the screen
 
-        it returns coordinates of the cells to be printed on the console
+        it returns an iterator over coordinates and symbols of the style of the cells to be printed on the console
         """
         self._adjust_borders()
 
-        result = []
+        key = (sheight, swidth, style.width, self.border_top, self.border_left, on_top)
+        if self.layout is None or self.layout.key != key:
+            self.layout = Layout(self, key, swidth=swidth, on_top=on_top, symbol_width=style.width)
+
+        return self._window_symbols(style.glyphs)
+
+    def _window_symbols(self, glyphs):
+        # symbols are looked up only when the field is rendered
+        missing = glyphs[Field.STATE_DOESNT_EXIST]
+        states = self.states
+        for y, x, cell in self.layout.cells:
+            yield y, x, glyphs[states[cell]] if cell >= 0 else missing
+
+
+class SparseField(Field):
+    """
+    field of a huge map storing only its ships and shot cells
+
+    a set of ship cells would take as much memory as the dense field, so ships are kept in
+    interval indexes instead: every row has sorted starts of its horizontal ships and every
+    column has those of its vertical ships. Shot cells are kept in a dict, all the other cells
+    are empty, so memory is proportional to the number of ships and shots
+    """
+
+    is_sparse = True
+
+    def __init__(self, height, width):
+        self.height = height  # map height
+        self.width = width  # map width
+        self.shots = {}  # y * width + x -> state of the shot cell
+        self.rows = {}  # y -> starts of the horizontal ships of the row and their ids
+        self.columns = {}  # x -> starts of the vertical ships of the column and their ids
+        self.ships = Fleet()  # placed ships, indexed by their ids
+        self.border_left = 0  # the left-most column of the sliding window
+        self.border_top = 0  # the top-most column of the sliding window
+        self.x_cur = self.y_cur = 0  # current active cell
+        self.layout = None  # cached positions of the sliding window on the screen
+        self.full_rows = None  # 1 for the rows found to have no cells that can be shot, see next_shootable
+
+    def clear_cells(self) -> None:
+        self.shots = {}
+        self.rows = {}
+        self.columns = {}
+        self.ships = Fleet()
+        self.full_rows = None
+
+    def ship_id(self, y: int, x: int) -> int:
+        for lines, line, position in ((self.rows, y, x), (self.columns, x, y)):
+            index = lines.get(line)
+            if index is None:
+                continue
+            starts, ids = index
+            i = bisect_right(starts, position) - 1
+            if i >= 0 and position < starts[i] + self.ships.sizes[ids[i]]:
+                return ids[i]
+        return Field.NO_SHIP
+
+    def state(self, y: int, x: int) -> int:
+        if y >= self.height or x >= self.width:
+            return Field.STATE_DOESNT_EXIST
+        state = self.shots.get(y * self.width + x)
+        if state is not None:
+            return state
+        return Field.STATE_SHIP if self.ship_id(y, x) != Field.NO_SHIP else Field.STATE_EMPTY
 
-        row_count = col_count = 0
-        if on_top:
-            for i in range(self.border_top, self.border_top + Field.WINDOW_HEIGHT):
-                for j in range(self.border_left, self.border_left + Field.WINDOW_WIDTH):
-                    x = swidth // 2 - Field.WINDOW_WIDTH * len(Field.EMPTY) // 2 + (len(Field.EMPTY) + 1) * col_count
-                    y = 3 + row_count
-                    result.append((y, x, f"{self.cells[i][j].symbol}"))
-                    col_count += 1
+    def has_ship(self, y: int, x: int) -> bool:
+        return self.ship_id(y, x) != Field.NO_SHIP
 
-                col_count = 0
-                row_count += 1
+    def ship_at(self, y: int, x: int):
+        ship_id = self.ship_id(y, x)
+        return self.ships[ship_id] if ship_id != Field.NO_SHIP else None
+
+    def place_ship(self, ship, y: int, x: int, is_vertical: bool) -> None:
+        ship_id = self.ships.add(ship.size, y, x, is_vertical, ship.health)
+        lines, line, position = (self.columns, x, y) if is_vertical else (self.rows, y, x)
+        if line not in lines:
+            lines[line] = array('q'), array('q')
+        starts, ids = lines[line]
+        i = bisect_right(starts, position)
+        starts.insert(i, position)
+        ids.insert(i, ship_id)
+
+    def get_shot(self, y: int, x: int, has_ship: bool) -> None:
+        self.shots[y * self.width + x] = Field.STATE_SHOT_HIT if has_ship else Field.STATE_SHOT_MISS
+
+    def mark_halo(self, halo) -> None:
+        for cells in halo:
+            self.shots.update(dict.fromkeys(cells, Field.STATE_SHOT_MISS))
+
+    def shot_cells(self, state: int):
+        return [cell for cell, shot in self.shots.items() if shot == state]
+
+    def _shootable_in_row(self, y: int, start: int):
+        # only the shot cells and the ships are stored, so the cells are looked at one by one
+        for x in range(start, self.width):
+            if self.shootable(y, x):
+                return x
+        return None
+
+    def random_shootable(self, rng, parity: int = 1, offset: int = 0, tries=None):
+        """
+        returns a random cell that can be shot with (y + x) % parity == offset
+
+        shot cells are a tiny part of the field, so random cells are drawn until such cell is found,
+        None is returned if it's not found in the given number of tries
+        """
+        attempt = 0
+        while tries is None or attempt < tries:
+            attempt += 1
+            y = rng.randrange(self.height)
+            x = rng.randrange(self.width)
+            x -= (y + x - offset) % parity
+            if x >= 0 and self.shootable(y, x):
+                break
         else:
-            for i in range(self.border_top, self.border_top + Field.WINDOW_HEIGHT):
-                for j in range(self.border_left, self.border_left + Field.WINDOW_WIDTH):
-                    x = swidth // 2 - Field.WINDOW_WIDTH * len(Field.EMPTY) // 2 + (len(Field.EMPTY) + 1) * col_count
-                    y = 17 + row_count
-                    result.append((y, x, f"{self.cells[i][j].symbol}"))
-                    col_count += 1
+            y = x = None
+        if profiling.enabled:
+            profiling.count('random_shootable.draws', attempt)
+        return None if y is None else (y, x)
+
+    def _window_symbols(self, glyphs):
+        missing = glyphs[Field.STATE_DOESNT_EXIST]
+        for y, x, cell in self.layout.cells:
+            yield y, x, glyphs[self.state(*divmod(cell, self.width))] if cell >= 0 else missing
 
-                col_count = 0
-                row_count += 1
 
-        return result
+def new_field(height: int, width: int) -> Field:
+    """
+    returns an empty field, a sparse one if the map is huge
+    """
+    if height * width > Field.SPARSE_CELLS:
+        return SparseField(height=height, width=width)
+    return Field(height=height, width=width)
@@ -1,28 +1,49 @@
 from player import Player
-from ship import Ship
-from field import Field
+from ship import Fleet
+from field import Field, new_field
+from ai import RandomStrategy
+from placement import TilePlacer
+import profiling
+import random
 
 
 class Game:
     # list of players
-    def __init__(self, height: int, width: int):
+    def __init__(self, height: int, width: int, seed=None):
+        # the same seed plays the same game, the seed is None if the game can't be repeated by it
+        self.seed = random.randrange(2 ** 63) if seed is None else seed
+        self.rng = random.Random(self.seed)  # shared by the players, the placement and AI
         self.players = []
         self.turn = 0
         self.is_finished = False
         self.winner = None
         self.longest_ship_sz = 0  # the size of the longest ship
+        self.alive_ships = [0, 0]  # number of alive ships of every player
+        self.alive_by_size = [[], []]  # number of alive ships of every size (from 1) of every player
+        self.damaged = [{}, {}]  # ship id -> a hit cell (y, x) of the hit but not destroyed ships of every player
         self.map_height = height
         self.map_width = width
+        self.moves = []  # journal of the shots (shooter, y, x) made since the game was prepared or loaded
+        self.moves_before = 0  # number of the shots made before the ones in the journal
 
-    def _init_players(self, player_name: str) -> None:
+    def _init_players(self, player_name: str, ai_strategy: str, player_strategy, opponent_name=None) -> None:
         """
         method for initialization of players
+
+        the first player is human unless player_strategy is given,
+        the second one is AI unless opponent_name of a human is given
         """
-        human = Player(name=player_name, is_human=True)
-        computer = Player(name="AI", is_human=False)
+        if player_strategy is None:
+            first = Player(name=player_name, is_human=True, rng=self.rng)
+        else:
+            first = Player(name=player_name, is_human=False, strategy=player_strategy, rng=self.rng)
+        if opponent_name is None:
+            second = Player(name="AI", is_human=False, strategy=ai_strategy, rng=self.rng)
+        else:
+            second = Player(name=opponent_name, is_human=True, rng=self.rng)
 
-        self.players.append(human)
-        self.players.append(computer)
+        self.players.append(first)
+        self.players.append(second)
 
     def _init_ships(self) -> None:
         """
@@ -51,70 +72,105 @@ class Game:
             ships_area = (1 / 6) * n * (n + 1) * (n + 2)
 
         self.longest_ship_sz = n
-        fp_ships = []  # 1st player's ships
-        sp_ships = []  # 2nd player's ships
+        sizes = []
         count = 1
         while n > 0:
-            # creating "count" number of ships of size "n" for both players
-            for i in range(count):
-                fp_ships.append(Ship(n))
-                sp_ships.append(Ship(n))
+            # "count" number of ships of size "n"
+            sizes += [n] * count
             count += 1
             n -= 1
 
-        # setting players' ships
-        self.players[0].set_ships(ships=fp_ships)
-        self.players[1].set_ships(ships=sp_ships)
+        # setting players' ships, every player has a fleet of its own
+        for player in self.players:
+            player.set_ships(ships=Fleet(sizes))
+
+        self.alive_ships = [len(player.ships) for player in self.players]
+        self.alive_by_size = [player.ships.alive_by_size(self.longest_ship_sz) for player in self.players]
 
-    def _init_fields(self) -> None:
+    def _init_fields(self, layouts=None) -> None:
         """
         method for placing ships on both players' fields
+
+        layouts: cache of pre-generated layouts of the fleets, the fleets are placed from scratch if it's None
         """
         # set player.my_field
-        self.players[0].set_and_fill_field(field=Field(height=self.map_height, width=self.map_width))
-        self.players[1].set_and_fill_field(field=Field(height=self.map_height, width=self.map_width))
+        fields = [new_field(height=self.map_height, width=self.map_width) for _ in self.players]
+        # fields whose fleets aren't placed yet
+        missing = list(zip(self.players, fields))
+        if layouts is not None and layouts.fits(self.map_height, self.map_width):
+            missing = [(player, field) for player, field in missing
+                       if not self._fill_from_cache(player, field, layouts)]
+            # the taken layouts are replaced while the game is played
+            layouts.refill(self.map_height, self.map_width, [ship.size for ship in self._by_size(self.players[0])])
+
+        if missing and TilePlacer.fits(fields[0]):
+            # tiles of the fields are placed at the same time by worker processes
+            placer = TilePlacer(rng=self.rng)
+            with profiling.timed('placement'):
+                placer.place([(field, player.ships) for player, field in missing])
+            if profiling.enabled:
+                profiling.count('placement.tiles', placer.stats['tiles'])
+            for player, field in missing:
+                player.my_field = field
+        else:
+            for player, field in missing:
+                player.set_and_fill_field(field=field)
+
+        # the fleets of the fields are the ones the game goes on with, they are indexed by ship ids
+        for player in self.players:
+            player.set_ships(player.my_field.ships)
 
         # set player.enemy_field
-        self.players[0].enemy_field = Field(height=self.map_height, width=self.map_width)
-        self.players[1].enemy_field = Field(height=self.map_height, width=self.map_width)
+        self.players[0].enemy_field = new_field(height=self.map_height, width=self.map_width)
+        self.players[1].enemy_field = new_field(height=self.map_height, width=self.map_width)
+
+    @staticmethod
+    def _by_size(player):
+        return sorted(player.ships, key=lambda ship: ship.size, reverse=True)
 
-    def prepare_game(self, player_name: str) -> None:
+    def _fill_from_cache(self, player, field, layouts) -> bool:
+        """
+        method for placing player's ships by a cached layout, returns False if the cache is empty
+        """
+        ships = self._by_size(player)
+        layout = layouts.pop(self.map_height, self.map_width, [ship.size for ship in ships], self.rng)
+        if layout is None:
+            return False
+        # the cached layout doesn't follow from the seed
+        self.seed = None
+        player.my_field = field
+        for ship, (y, x, is_vertical) in zip(ships, layout):
+            field.place_ship(ship, y=y, x=x, is_vertical=is_vertical)
+        return True
+
+    def prepare_game(self, player_name: str, ai_strategy: str = RandomStrategy.NAME, player_strategy=None,
+                     opponent_name=None, layouts=None) -> None:
         """
         method for preparing everything needed to play the game
+
+        layouts: cache of pre-generated layouts of the fleets, the seed of a game taking a layout from it is None
         """
-        self._init_players(player_name=player_name)
+        self._init_players(player_name=player_name, ai_strategy=ai_strategy, player_strategy=player_strategy,
+                           opponent_name=opponent_name)
         self._init_ships()
-        self._init_fields()
+        self._init_fields(layouts)
 
-    def _ship_mark_destroyed(self, player, ship, my_field: bool):
+    @staticmethod
+    def _sink(shooter, target, ship_id: int) -> None:
         """
-        methods marks surrounding of the destroyed ship as "was shot"
-        """
-
-        field = player.my_field if my_field else player.enemy_field
+        method marks surrounding of the destroyed ship as "was shot" on both players' fields
 
-        if ship.is_vertical:
-            if ship.y - 1 >= 0:
-                field.cells[ship.y - 1][ship.x].get_shot(has_ship=False)
-            for i in range(-1, ship.size + 1):
-                if 0 <= ship.y + i < field.height:
-                    if ship.x - 1 >= 0:
-                        field.cells[ship.y + i][ship.x - 1].get_shot(has_ship=False)
-                    if ship.x + 1 < field.width:
-                        field.cells[ship.y + i][ship.x + 1].get_shot(has_ship=False)
-            if ship.y + ship.size < field.height:
-                field.cells[ship.y + ship.size][ship.x].get_shot(has_ship=False)
-        else:
-            if ship.x - 1 >= 0:
-                field.cells[ship.y][ship.x - 1].get_shot(has_ship=False)
-            for i in range(-1, ship.size + 1):
-                if 0 <= ship.x + i < field.width:
-                    if ship.y - 1 >= 0:
-                        field.cells[ship.y - 1][ship.x + i].get_shot(has_ship=False)
-                    if ship.y + 1 < field.height:
-                        field.cells[ship.y + 1][ship.x + i].get_shot(has_ship=False)
-            if ship.x + ship.size < field.width:
-                field.cells[ship.y][ship.x + ship.size].get_shot(has_ship=False)
+        the surrounding is at most four ranges of cells, so it's marked a slice at a time
+        """
+        if profiling.enabled:
+            profiling.count('sinks')
+        halo = target.my_field.halo(ship_id)
+        target.my_field.mark_halo(halo)
+        # the minimap skips the cells which were shot before
+        if shooter.minimap is not None:
+            shooter.minimap.add_halo(shooter.enemy_field, halo)
+        shooter.enemy_field.mark_halo(halo)
+        shooter.forget_targets(halo)
 
     def check_victory(self):
         """
@@ -122,39 +178,12 @@ class Game:
         """
         # obtaining players
         cur_player = self.players[self.turn % 2]  # shoots
-        other_player = self.players[(self.turn + 1) % 2]  # gets shot
 
-        has_won = True
-        for ship in other_player.ships:
-            if ship.health > 0:
-                has_won = False
-                break
-
-        if has_won:
+        # the other player has no ships left
+        if self.alive_ships[(self.turn + 1) % 2] == 0:
             self.is_finished = True
             self.winner = cur_player
 
-    def _player_get_shot(self, player, y_shot, x_shot):
-        """
-        method for player who is getting shot
-        """
-        # shot cell
-        cell = player.my_field.cells[y_shot][x_shot]
-        ship = cell.ship
-
-        # if ship was hit
-        if ship:
-            ship.health -= 1
-            # if it was destroyed
-            if ship.health <= 0:
-                cell.get_shot(has_ship=True)
-                self._ship_mark_destroyed(player=player, ship=ship, my_field=True)
-            # if it was damaged
-            else:
-                cell.get_shot(has_ship=True)
-        else:
-            cell.get_shot(has_ship=False)
-
     def player_shoot(self) -> (bool, bool):
         """
         player whose turn is now shooting at the other player
@@ -171,41 +200,80 @@ class Game:
         y_shot = cur_player.enemy_field.y_cur
 
         # if the cell isn't shootable, then return False
-        if not cur_player.enemy_field.cells[y_shot][x_shot].shootable():
+        if not cur_player.enemy_field.shootable(y_shot, x_shot):
             return False, False
 
-        # other player marks where he/she was shot
-        self._player_get_shot(player=other_player, y_shot=y_shot, x_shot=x_shot)
-
-        # if hit enemy ship
-        if other_player.my_field.cells[y_shot][x_shot].ship:
-            # mark as hit
-            cur_player.enemy_field.cells[y_shot][x_shot].get_shot(has_ship=True)
-            # if ship was destroyed
-            if other_player.my_field.cells[y_shot][x_shot].ship.health <= 0:
-                # mark as destroyed
-                self._ship_mark_destroyed(player=cur_player, my_field=False,
-                                          ship=other_player.my_field.cells[y_shot][x_shot].ship)
-            return True, True
-        else:
-            cur_player.enemy_field.cells[y_shot][x_shot].get_shot(has_ship=False)
+        self.moves.append((self.turn % 2, y_shot, x_shot))
+        if profiling.enabled:
+            profiling.count('shots')
+
+        ship_id = other_player.my_field.ship_id(y_shot, x_shot)
+        has_ship = ship_id != Field.NO_SHIP
+        # both players mark the shot cell
+        other_player.my_field.get_shot(y_shot, x_shot, has_ship=has_ship)
+        cur_player.enemy_field.get_shot(y_shot, x_shot, has_ship=has_ship)
+        if cur_player.minimap is not None:
+            cur_player.minimap.add_shot(y_shot, x_shot, has_ship)
+        cur_player.forget_target(y_shot, x_shot)
+        if not has_ship:
             return True, False
 
-    def num_alive_ships(self):
+        fleet = other_player.my_field.ships
+        index = self.players.index(other_player)
+        # the ship is damaged or destroyed
+        if fleet.hit(ship_id) > 0:
+            self.damaged[index].setdefault(ship_id, (y_shot, x_shot))
+        else:
+            self.damaged[index].pop(ship_id, None)
+            self.alive_ships[index] -= 1
+            self.alive_by_size[index][fleet.sizes[ship_id] - 1] -= 1
+            self._sink(shooter=cur_player, target=other_player, ship_id=ship_id)
+        return True, True
+
+    def ai_shoot(self) -> (bool, bool):
         """
-        methods for calculating alive ships of both players
+        the current player, who must be AI, picks a cell and shoots at it
+
+        returns the same values as player_shoot
         """
-        statistics = []
-        for player in self.players:
-            ships_alive = [0 for _ in range(self.longest_ship_sz)]
-            for ship in player.ships:
-                if ship.health > 0:
-                    ships_alive[ship.size - 1] += 1
+        cur_player = self.players[self.turn % 2]
+        cur_player.enemy_field.y_cur, cur_player.enemy_field.x_cur = cur_player.get_ai_shoot(self)
+        return self.player_shoot()
 
-            statistics.append(ships_alive)
+    def index_damaged(self, index: int) -> None:
+        """
+        method for finding the damaged ships of the player, e.g. after the game was loaded
+        """
+        field = self.players[index].my_field
+        fleet = field.ships
+        self.damaged[index] = {}
+        for ship_id, (size, health) in enumerate(zip(fleet.sizes, fleet.health)):
+            if 0 < health < size:
+                self.damaged[index][ship_id] = next(cell for cell in fleet[ship_id].cells()
+                                                    if field.state(*cell) == Field.STATE_SHOT_HIT)
+
+    def next_damaged(self, index: int, y: int, x: int):
+        """
+        returns a hit cell of the player's damaged ship which is the first after (y, x) row by row,
+        None if there are no damaged ships
+
+        the search goes on from the top of the field after the last cell
+        """
+        if not self.damaged[index]:
+            return None
+        cells = self.map_height * self.map_width
+        start = y * self.map_width + x
+        return min(self.damaged[index].values(),
+                   key=lambda cell: (cell[0] * self.map_width + cell[1] - start - 1) % cells)
 
-        return statistics[0], statistics[1]
+    def num_alive_ships(self):
+        """
+        methods for obtaining alive ships of every size of both players
+
+        counters are kept up to date when ships are destroyed, they shouldn't be modified by the caller
+        """
+        return self.alive_by_size[0], self.alive_by_size[1]
 
-    def display_field(self, sheight, swidth):
+    def display_field(self, sheight, swidth, style):
         # displaying human's fields
-        return self.players[0].display_field(sheight=sheight, swidth=swidth)
+        return self.players[0].display_field(sheight=sheight, swidth=swidth, style=style)
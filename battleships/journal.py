@@ -0,0 +1,108 @@
+"""
+append-only journals
+
+a journal is a sequence of records: type u8, length of the payload u32, crc32 of the payload u32, payload.
+Records are only appended, so a crash can tear only the last record, such a record is dropped.
+
+Payloads of some records can be aligned to pages, so they can be mapped into memory,
+a PAD record of zeros is appended before such a record
+"""
+import mmap
+import os
+import struct
+import zlib
+
+_HEADER = struct.Struct('<BII')
+
+PAD = 0  # type of the padding records
+PAGE = mmap.ALLOCATIONGRANULARITY  # alignment of the mapped payloads
+
+
+class Record:
+    """
+    position of a record in the journal
+    """
+
+    def __init__(self, type: int, offset: int, length: int, crc: int, head: bytes):
+        self.type = type
+        self.offset = offset  # offset of the payload
+        self.length = length  # length of the payload
+        self.crc = crc
+        self.head = head  # the first bytes of the payload
+
+    @property
+    def end(self) -> int:
+        return self.offset + self.length
+
+
+def append(path: str, records, aligned=()):
+    """
+    appends (type, payload) records to the journal, they are on the disk when the function returns
+
+    payloads of the records of the aligned types start at page boundaries,
+    returns offsets of the payloads
+    """
+    offsets = []
+    with open(path, 'ab') as journal:
+        offset = journal.tell()
+        for type, payload in records:
+            if type in aligned:
+                padding = -(offset + 2 * _HEADER.size) % PAGE
+                journal.write(_HEADER.pack(PAD, padding, zlib.crc32(bytes(padding))) + bytes(padding))
+                offset += _HEADER.size + padding
+            journal.write(_HEADER.pack(type, len(payload), zlib.crc32(payload)))
+            journal.write(payload)
+            offset += _HEADER.size
+            offsets.append(offset)
+            offset += len(payload)
+        journal.flush()
+        os.fsync(journal.fileno())
+    return offsets
+
+
+def scan(path: str, head: int = 0):
+    """
+    returns complete records of the journal reading only their headers and the first head bytes of the payloads
+    """
+    records = []
+    size = os.path.getsize(path)
+    with open(path, 'rb') as journal:
+        offset = 0
+        while offset + _HEADER.size <= size:
+            journal.seek(offset)
+            type, length, crc = _HEADER.unpack(journal.read(_HEADER.size))
+            offset += _HEADER.size
+            if offset + length > size:
+                break
+            records.append(Record(type, offset, length, crc, journal.read(min(head, length))))
+            offset += length
+    return records
+
+
+def read(journal, record: Record) -> bytes:
+    """
+    returns payload of the record, raises ValueError if it's corrupted
+    """
+    journal.seek(record.offset)
+    payload = journal.read(record.length)
+    if len(payload) != record.length or zlib.crc32(payload) != record.crc:
+        raise ValueError(f"the record at {record.offset} is corrupted")
+    return payload
+
+
+def map_payload(journal, offset: int, length: int):
+    """
+    returns a copy-on-write mapping of the aligned payload, raises ValueError if it's out of the journal
+
+    nothing is read until the pages of the mapping are touched, so the crc isn't checked
+    """
+    if offset % PAGE or offset + length > os.fstat(journal.fileno()).st_size:
+        raise ValueError(f"no mapped record at {offset}")
+    return mmap.mmap(journal.fileno(), length, access=mmap.ACCESS_COPY, offset=offset)
+
+
+def truncate(path: str, records) -> None:
+    """
+    drops everything after the records, e.g. a torn record
+    """
+    os.truncate(path, records[-1].end if records else 0)
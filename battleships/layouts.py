@@ -0,0 +1,177 @@
+"""
+pools of pre-generated fleet layouts
+
+layouts of the same field and fleet are kept in a journal (see journal.py), layouts/<key>.pool,
+a record is a zlib-compressed layout: (y * width + x) * 2 + is_vertical u32 of every ship
+with the ships sorted by size from the longest. A game takes the last record and truncates it,
+the pool is refilled by a worker process with the lowest priority while the game is played.
+Every layout is mirrored or rotated at random when it's taken, so a pool repeats itself rarely
+"""
+from placement import _place_tile
+import journal
+import multiprocessing
+import os
+import profiling
+import random
+import struct
+import threading
+import zlib
+
+LAYOUTS_PATH = 'layouts'
+POOL_SIZE = 8  # layouts kept for every field, two of them are taken by a game
+MAX_CELLS = 1 << 22  # larger fields aren't cached
+LAYOUT = 1  # type of the records
+
+# (y, x) -> (y, x) of the field's symmetries, the last four ones turn the field, so they are only for squares
+_SYMMETRIES = (
+    lambda y, x, h, w: (y, x),
+    lambda y, x, h, w: (h - 1 - y, x),
+    lambda y, x, h, w: (y, w - 1 - x),
+    lambda y, x, h, w: (h - 1 - y, w - 1 - x),
+    lambda y, x, h, w: (x, y),
+    lambda y, x, h, w: (x, h - 1 - y),
+    lambda y, x, h, w: (w - 1 - x, y),
+    lambda y, x, h, w: (w - 1 - x, h - 1 - y),
+)
+
+
+def _lower_priority() -> None:
+    # the worker shouldn't slow down the game
+    if hasattr(os, 'nice'):
+        os.nice(19)
+
+
+def _generate(height: int, width: int, sizes, count: int):
+    """
+    returns payloads of the count new layouts, runs in the worker process
+    """
+    rng = random.Random()
+    payloads = []
+    for _ in range(count):
+        placed = _place_tile((height, width, sizes, rng.getrandbits(64), False))
+        values = [(placed[k] * width + placed[k + 1]) * 2 + placed[k + 2] for k in range(0, len(placed), 3)]
+        payloads.append(zlib.compress(struct.pack(f'<{len(values)}I', *values)))
+    return payloads
+
+
+def _transform(layout, sizes, height: int, width: int, symmetry: int):
+    """
+    returns (y, x, is_vertical) of the ships of the layout turned by the symmetry
+    """
+    turn = _SYMMETRIES[symmetry]
+    turned = []
+    for (y, x, is_vertical), size in zip(layout, sizes):
+        # both ends of the ship are turned, the new head is the smaller one
+        head = turn(y, x, height, width)
+        tail = turn(y + (size - 1) * is_vertical, x + (size - 1) * (not is_vertical), height, width)
+        y, x = min(head, tail)
+        turned.append((y, x, head[1] == tail[1] if size > 1 else is_vertical))
+    return turned
+
+
+class LayoutCache:
+    """
+    on-disk pools of fleet layouts shared by the games
+
+    the pools are changed by the game thread and by the thread receiving layouts from the worker
+    """
+
+    def __init__(self, directory: str = LAYOUTS_PATH, pool_size: int = POOL_SIZE):
+        self.directory = directory
+        self.pool_size = pool_size
+        self.lock = threading.Lock()
+        self.pool = None  # worker process, started by the first refill
+        self.pending = {}  # path of the pool -> number of its layouts being generated
+        self.error = None  # the last error of taking or storing layouts, it's reset when taken
+
+    @staticmethod
+    def fits(height: int, width: int) -> bool:
+        return height * width <= MAX_CELLS
+
+    def _path(self, height: int, width: int, sizes) -> str:
+        # the fleet is described by its longest ship, fleets of the same field only differ by it
+        return os.path.join(self.directory, f'{height}x{width}-{sizes[0]}.pool')
+
+    def _records(self, path: str):
+        return journal.scan(path) if os.path.exists(path) else []
+
+    def pop(self, height: int, width: int, sizes, rng):
+        """
+        returns (y, x, is_vertical) of the ships of the given sizes sorted from the longest, None if the pool is empty
+
+        the layout is removed from the pool, it's mirrored or rotated by the rng
+        """
+        path = self._path(height, width, sizes)
+        payload = None
+        with self.lock:
+            try:
+                records = self._records(path)
+                if records:
+                    with open(path, 'rb') as file:
+                        payload = zlib.decompress(journal.read(file, records[-1]))
+                    journal.truncate(path, records[:-1])
+            except (OSError, ValueError, zlib.error) as e:
+                self.error = e
+                payload = None
+
+        if profiling.enabled:
+            profiling.count('layouts.hits' if payload is not None else 'layouts.misses')
+        if payload is None or len(payload) != 4 * len(sizes):
+            return None
+
+        values = struct.unpack(f'<{len(sizes)}I', payload)
+        layout = [(*divmod(value >> 1, width), value & 1) for value in values]
+        symmetries = len(_SYMMETRIES) if height == width else len(_SYMMETRIES) // 2
+        return _transform(layout, sizes, height, width, rng.randrange(symmetries))
+
+    def refill(self, height: int, width: int, sizes) -> None:
+        """
+        generates the missing layouts of the pool in the background
+        """
+        path = self._path(height, width, sizes)
+        with self.lock:
+            try:
+                missing = self.pool_size - len(self._records(path)) - self.pending.get(path, 0)
+            except OSError as e:
+                self.error = e
+                return
+            if missing <= 0:
+                return
+            self.pending[path] = self.pending.get(path, 0) + missing
+
+        if self.pool is None:
+            self.pool = multiprocessing.Pool(1, initializer=_lower_priority)
+        self.pool.apply_async(_generate, (height, width, list(sizes), missing),
+                              callback=lambda payloads: self._store(path, missing, payloads),
+                              error_callback=lambda e: self._store(path, missing, [], e))
+
+    def _store(self, path: str, count: int, payloads, error=None) -> None:
+        with self.lock:
+            self.pending[path] -= count
+            if error is not None:
+                self.error = error
+                return
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+                # a record torn by a crash would hide the appended ones
+                if os.path.exists(path):
+                    journal.truncate(path, self._records(path))
+                journal.append(path, [(LAYOUT, payload) for payload in payloads])
+            except OSError as e:
+                self.error = e
+
+    def take_error(self):
+        """
+        returns the last error of taking or storing layouts and forgets it, None if there was none
+        """
+        with self.lock:
+            error, self.error = self.error, None
+        return error
+
+    def close(self) -> None:
+        """
+        stops the worker, the layouts being generated are dropped
+        """
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
@@ -0,0 +1,107 @@
+from simulate import _percentile, _size
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+
+async def _client(host: str, port: int, height: int, width: int, strategy: str, deadline: float, seed: int,
+                  latencies) -> int:
+    """
+    plays matches against AI until the deadline, returns number of the matches played
+
+    latencies of the accepted shots are appended to latencies
+    """
+    rng = random.Random(seed)
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def request(line: str) -> str:
+        writer.write(line.encode() + b'\n')
+        answer = (await reader.readline()).decode()
+        if not answer.startswith('OK'):
+            raise RuntimeError(f"{line}: {answer.strip()}")
+        return answer
+
+    matches = 0
+    while time.perf_counter() < deadline:
+        await request(f'NEW {height} {width} {strategy} {rng.randrange(2 ** 32)}')
+        cells = [(y, x) for y in range(height) for x in range(width)]
+        rng.shuffle(cells)
+        # cells marked around sunk ships are shot too, the server refuses such shots
+        for y, x in cells:
+            start = time.perf_counter()
+            try:
+                answer = await request(f'SHOOT {y} {x}')
+            except RuntimeError:
+                continue
+            latencies.append(time.perf_counter() - start)
+            if ' WIN' in answer or time.perf_counter() >= deadline:
+                break
+        matches += 1
+
+    await request('QUIT')
+    writer.close()
+    return matches
+
+
+async def _run(args):
+    latencies = []
+    deadline = time.perf_counter() + args.seconds
+    start = time.perf_counter()
+    matches = await asyncio.gather(*(_client(args.host, args.port, *args.size, args.strategy, deadline, seed,
+                                             latencies) for seed in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'clients': args.clients,
+        'size': f'{args.size[0]}x{args.size[1]}',
+        'seconds': round(elapsed, 3),
+        'matches': sum(matches),
+        'moves': len(latencies),
+        'moves_per_sec': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'p50': round(_percentile(latencies, 50) * 1000, 3),
+            'p99': round(_percentile(latencies, 99) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+    }
+
+
+def _spawn_server(host: str):
+    """
+    starts the server in a child process, returns the process and its port
+    """
+    server = subprocess.Popen([sys.executable, os.path.dirname(os.path.abspath(__file__)), 'serve',
+                               '--host', host, '--port', '0'], stdout=subprocess.PIPE, text=True)
+    # the server prints "serving on host:port" when it's ready
+    port = int(server.stdout.readline().rsplit(':', 1)[1])
+    return server, port
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(prog='battleships loadgen',
+                                     description="plays many matches on a server and measures its latency")
+    parser.add_argument('--host', default='127.0.0.1', help="address of the server")
+    parser.add_argument('--port', type=int, help="port of the server, a local server is started if not given")
+    parser.add_argument('--clients', type=int, default=100, help="number of concurrent connections")
+    parser.add_argument('--seconds', type=float, default=10.0, help="duration of the load")
+    parser.add_argument('--size', type=_size, default=(10, 10), help="field size, NxK")
+    parser.add_argument('--strategy', default='random', help="AI of the server")
+    args = parser.parse_args(argv)
+
+    server = None
+    if args.port is None:
+        server, args.port = _spawn_server(args.host)
+    try:
+        stats = asyncio.run(_run(args))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(json.dumps(stats, indent=2))
+    return 0
@@ -0,0 +1,119 @@
+from array import array
+from field import Field
+
+
+class Minimap:
+    """
+    the whole field downsampled to rows x columns characters
+
+    every character summarises a block of the field's cells. The hit and the missed cells of every block
+    are counted when they are shot, so a shot updates one counter and a frame reads rows * columns
+    counters however large the field is. The counters are only built again if the grid changes,
+    e.g. when the terminal is resized
+    """
+
+    # unshot blocks, blocks shot less than a third, less than two thirds, not entirely and entirely
+    DENSITY = ' .:=#'
+    HIT = 'x'  # blocks with hit cells
+    CURSOR = '@'  # the block of the cursor
+
+    def __init__(self, field, rows: int, columns: int):
+        self.height = field.height
+        self.width = field.width
+        self.rows = rows
+        self.columns = columns
+        self.hits = array('i', [0]) * (rows * columns)  # number of the hit cells of every block
+        self.misses = array('i', [0]) * (rows * columns)  # number of the missed cells of every block
+        # number of the cells of every block row and of every block column
+        self.row_cells = [self._first(r + 1, self.height, rows) - self._first(r, self.height, rows)
+                          for r in range(rows)]
+        self.column_cells = [self._first(c + 1, self.width, columns) - self._first(c, self.width, columns)
+                             for c in range(columns)]
+
+        if not field.is_sparse:
+            self._count_rows(field.states)
+            return
+        # a sparse field keeps only its shot cells
+        for state, counters in ((Field.STATE_SHOT_HIT, self.hits), (Field.STATE_SHOT_MISS, self.misses)):
+            for cell in field.shot_cells(state):
+                counters[self.block(*divmod(cell, self.width))] += 1
+
+    def _count_rows(self, states) -> None:
+        """
+        counts the shot cells of the blocks a row of the field at a time, the part of the row in every block
+        is counted by bytes.count, the rows without cells in the state are skipped
+        """
+        starts = [self._first(c, self.width, self.columns) for c in range(self.columns + 1)]
+        parts = list(zip(starts, starts[1:]))
+        for y in range(self.height):
+            # mapped states are sliced into bytes, they have no count
+            row = states[y * self.width:(y + 1) * self.width]
+            first = y * self.rows // self.height * self.columns
+            for state, counters in ((Field.STATE_SHOT_HIT, self.hits), (Field.STATE_SHOT_MISS, self.misses)):
+                target = bytes([state])
+                if target not in row:
+                    continue
+                for block, (start, end) in enumerate(parts, first):
+                    counters[block] += row.count(target, start, end)
+
+    @staticmethod
+    def _first(block: int, length: int, blocks: int) -> int:
+        # the first line of the block, line i belongs to the block i * blocks // length
+        return -(-block * length // blocks)
+
+    @staticmethod
+    def fit(height: int, width: int, rows: int, columns: int):
+        """
+        returns rows and columns of the largest grid fitting into the given ones which keeps the field's
+        proportions, None if it's too small. Characters are about twice as high as wide
+        """
+        scale = min(rows / height, columns / (2 * width), 1)
+        rows, columns = min(height, max(1, round(height * scale))), min(width, max(1, round(2 * width * scale)))
+        if columns < 4:
+            return None
+        return rows, columns
+
+    def block(self, y: int, x: int) -> int:
+        return (y * self.rows // self.height) * self.columns + x * self.columns // self.width
+
+    def add_shot(self, y: int, x: int, has_ship: bool) -> None:
+        """
+        counts the cell which has just been shot
+        """
+        (self.hits if has_ship else self.misses)[self.block(y, x)] += 1
+
+    def add_halo(self, field, halo) -> None:
+        """
+        counts the cells around a destroyed ship before they are marked as missed on the field,
+        the cells which have already been shot aren't counted again
+        """
+        for cells in halo:
+            for cell in cells:
+                y, x = divmod(cell, self.width)
+                if field.shootable(y, x):
+                    self.misses[self.block(y, x)] += 1
+
+    def lines(self, y_cur: int, x_cur: int):
+        """
+        returns lines of the characters of the blocks, the block of the cursor is marked
+        """
+        cursor = self.block(y_cur, x_cur)
+        density = len(Minimap.DENSITY) - 2
+        lines = []
+        for r in range(self.rows):
+            line = []
+            for c in range(self.columns):
+                block = r * self.columns + c
+                cells = self.row_cells[r] * self.column_cells[c]
+                shot = self.hits[block] + self.misses[block]
+                if block == cursor:
+                    line.append(Minimap.CURSOR)
+                elif self.hits[block]:
+                    line.append(Minimap.HIT)
+                elif shot == cells:
+                    line.append(Minimap.DENSITY[-1])
+                else:
+                    # unshot blocks stay blank, the others have at least a dot
+                    line.append(Minimap.DENSITY[-(-shot * density // cells)])
+            lines.append(''.join(line))
+        return lines
@@ -0,0 +1,576 @@
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from field import Field, SparseField
+from ship import Fleet
+import os
+import random
+import re
+
+# tables for adding/subtracting one to every byte of a slice
+_INCREMENT = bytes((i + 1) % 256 for i in range(256))
+_DECREMENT = bytes((i - 1) % 256 for i in range(256))
+_FREE_RUN = re.compile(b'\x00+')
+
+
+class _FenwickTree:
+    """
+    prefix sums over the number of possible placements on every line of the field
+    """
+
+    def __init__(self, values):
+        self.size = len(values)
+        self.tree = [0] * (self.size + 1)
+        for i, value in enumerate(values, 1):
+            self.tree[i] += value
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+        self.total = sum(values)
+
+    def add(self, index: int, delta: int) -> None:
+        self.total += delta
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, k: int):
+        """
+        returns index of the line holding the k-th placement and k's offset inside that line
+        """
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self.tree[nxt] <= k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos, k
+
+
+class FleetPlacer:
+    """
+    constructive placement of the fleet
+
+    the placer keeps a grid counting how many ship halos (a ship and the cells around it)
+    cover every cell. Ships are placed largest first. A few random placements are probed
+    against the grid, which is cheap while the field is sparse. Once probing fails, rows
+    and columns get sorted lists of free runs (kept up to date from then on) and the ship
+    is put on a placement drawn uniformly from all the placements that are still possible.
+    If a ship doesn't fit at all, only the last few ships are taken back and placed again.
+    When the backtracking budget is spent the search starts over, after SEARCHES searches
+    the fleet is packed into random lanes. Packing fits every fleet of a field from 5x5 (see _pack)
+    """
+
+    PROBES = 64  # random placements tried before the free runs are consulted
+    BACKTRACKS_PER_SHIP = 2  # budget of local backtracking steps
+    SEARCHES = 4  # searches made before the fleet is packed
+
+    def __init__(self, field, rng=random):
+        self.field = field
+        self.rng = rng
+        self.height = field.height
+        self.width = field.width
+        self.stats = {'attempts': 0, 'placed': 0, 'probes': 0, 'backtracks': 0, 'fallbacks': 0}
+
+    def _reset(self) -> None:
+        """
+        every cell is free
+        """
+        self.blocked = bytearray(self.height * self.width)  # how many ship halos cover the cell
+        # free runs of the rows (along x) followed by free runs of the columns (along y),
+        # they are built once probing stops working
+        self.starts = self.ends = None
+        self.tree = None
+        self.tree_size = 0
+
+    def _build_runs(self) -> None:
+        self.starts, self.ends = [], []
+        for i in range(self.height):
+            runs = [m.span() for m in _FREE_RUN.finditer(self.blocked, i * self.width, (i + 1) * self.width)]
+            self.starts.append([start - i * self.width for start, _ in runs])
+            self.ends.append([end - i * self.width for _, end in runs])
+        for j in range(self.width):
+            runs = [m.span() for m in _FREE_RUN.finditer(self.blocked[j::self.width])]
+            self.starts.append([start for start, _ in runs])
+            self.ends.append([end for _, end in runs])
+
+    def _runs_count(self, line: int, starts, ends, size: int) -> int:
+        """
+        number of ways to put a ship of the size onto the given runs of the line
+        """
+        # ships of size 1 look the same in both orientations, count them once
+        if size == 1 and line >= self.height:
+            return 0
+        return sum(end - start - size + 1 for start, end in zip(starts, ends) if end - start >= size)
+
+    def _build_tree(self, size: int) -> None:
+        if self.starts is None:
+            self._build_runs()
+        self.tree = _FenwickTree([self._runs_count(line, self.starts[line], self.ends[line], size)
+                                  for line in range(self.height + self.width)])
+        self.tree_size = size
+
+    def _replace_runs(self, line: int, index: int, last: int, new_starts, new_ends) -> None:
+        """
+        replaces runs [index, last) of the line with the new ones
+        """
+        starts, ends = self.starts[line], self.ends[line]
+        if self.tree is not None:
+            delta = self._runs_count(line, new_starts, new_ends, self.tree_size) \
+                - self._runs_count(line, starts[index:last], ends[index:last], self.tree_size)
+            if delta:
+                self.tree.add(line, delta)
+        starts[index:last] = new_starts
+        ends[index:last] = new_ends
+
+    def _take(self, line: int, a: int, b: int) -> None:
+        """
+        removes [a, b) from the free runs of the line
+        """
+        starts, ends = self.starts[line], self.ends[line]
+        index = last = bisect_right(ends, a)
+        new_starts, new_ends = [], []
+        while last < len(starts) and starts[last] < b:
+            if starts[last] < a:
+                new_starts.append(starts[last])
+                new_ends.append(a)
+            if ends[last] > b:
+                new_starts.append(b)
+                new_ends.append(ends[last])
+            last += 1
+        self._replace_runs(line, index, last, new_starts, new_ends)
+
+    def _give_back(self, line: int, a: int, b: int) -> None:
+        """
+        returns free cells of [a, b) to the runs of the line
+
+        no run intersects [a, b) at this point since the whole segment has just been blocked
+        """
+        if line < self.height:
+            segment = self.blocked[line * self.width + a:line * self.width + b]
+        else:
+            column = line - self.height
+            segment = self.blocked[a * self.width + column:b * self.width + column:self.width]
+
+        runs = [m.span() for m in _FREE_RUN.finditer(segment)]
+        if not runs:
+            return
+        new_starts = [a + start for start, _ in runs]
+        new_ends = [a + end for _, end in runs]
+
+        starts, ends = self.starts[line], self.ends[line]
+        index = last = bisect_left(starts, a)
+        # merge with neighbouring runs
+        if index > 0 and ends[index - 1] == new_starts[0]:
+            index -= 1
+            new_starts[0] = starts[index]
+        if last < len(starts) and starts[last] == new_ends[-1]:
+            new_ends[-1] = ends[last]
+            last += 1
+        self._replace_runs(line, index, last, new_starts, new_ends)
+
+    def _halo(self, size: int, y: int, x: int, is_vertical: bool):
+        """
+        returns rectangle [y0, y1) x [x0, x1) taken by the ship and its surrounding
+        """
+        height, width = (size, 1) if is_vertical else (1, size)
+        return max(0, y - 1), min(self.height, y + height + 1), max(0, x - 1), min(self.width, x + width + 1)
+
+    def _add_halo(self, y0: int, y1: int, x0: int, x1: int, table: bytes) -> None:
+        """
+        adds one to (or subtracts one from) the counters of the rectangle
+        """
+        if y1 - y0 <= x1 - x0:
+            for i in range(y0, y1):
+                row = slice(i * self.width + x0, i * self.width + x1)
+                self.blocked[row] = self.blocked[row].translate(table)
+        else:
+            for j in range(x0, x1):
+                column = slice(y0 * self.width + j, (y1 - 1) * self.width + j + 1, self.width)
+                self.blocked[column] = self.blocked[column].translate(table)
+
+    def _block(self, size: int, y: int, x: int, is_vertical: bool) -> None:
+        y0, y1, x0, x1 = self._halo(size, y, x, is_vertical)
+        self._add_halo(y0, y1, x0, x1, _INCREMENT)
+        if self.starts is None:
+            return
+        for i in range(y0, y1):
+            self._take(i, x0, x1)
+        for j in range(x0, x1):
+            self._take(self.height + j, y0, y1)
+
+    def _unblock(self, size: int, y: int, x: int, is_vertical: bool) -> None:
+        y0, y1, x0, x1 = self._halo(size, y, x, is_vertical)
+        self._add_halo(y0, y1, x0, x1, _DECREMENT)
+        if self.starts is None:
+            return
+        for i in range(y0, y1):
+            self._give_back(i, x0, x1)
+        for j in range(x0, x1):
+            self._give_back(self.height + j, y0, y1)
+
+    def _is_free(self, size: int, y: int, x: int, is_vertical: bool) -> bool:
+        head = y * self.width + x
+        if is_vertical:
+            cells = self.blocked[head:head + (size - 1) * self.width + 1:self.width]
+        else:
+            cells = self.blocked[head:head + size]
+        return not any(cells)
+
+    def _probe(self, size: int):
+        """
+        returns random free placement found by trying a few random ones, None if none of them is free
+        """
+        horizontal = self.height * max(0, self.width - size + 1)
+        vertical = max(0, self.height - size + 1) * self.width if size > 1 else 0
+        if horizontal + vertical == 0:
+            return None
+
+        for _ in range(self.PROBES):
+            self.stats['probes'] += 1
+            k = self.rng.randrange(horizontal + vertical)
+            if k < horizontal:
+                y, x, is_vertical = k // (self.width - size + 1), k % (self.width - size + 1), False
+            else:
+                k -= horizontal
+                y, x, is_vertical = k // self.width, k % self.width, True
+            if self._is_free(size, y, x, is_vertical):
+                return y, x, is_vertical
+        return None
+
+    def _sample(self, size: int):
+        """
+        returns random free placement for a ship of the size, None if there is no such placement
+        """
+        if self.tree is not None and self.tree_size != size:
+            # counts of the other size are useless, they are rebuilt only if probing fails again
+            self.tree = None
+        if self.tree is None:
+            spot = self._probe(size)
+            if spot is not None:
+                return spot
+            self._build_tree(size)
+        if self.tree.total == 0:
+            return None
+
+        line, k = self.tree.find(self.rng.randrange(self.tree.total))
+        for start, end in zip(self.starts[line], self.ends[line]):
+            options = end - start - size + 1
+            if options <= 0:
+                continue
+            if k < options:
+                if line < self.height:
+                    return line, start + k, False
+                return start + k, line - self.height, True
+            k -= options
+
+    def _pack(self, ships):
+        """
+        placement used when the searches run out of budget
+
+        ships are split first-fit into lanes along the longer side of the field, if they don't fit
+        they are split along the shorter side. One of the ways fits the fleet of every field of the game:
+        it's checked for all the fields up to 400x400 (only 6x9 needs the shorter side), larger fields
+        have even more room left. The lanes are put on random lines at least a line apart, the ships
+        of a lane are shuffled and the free cells of the lane are spread between them at random
+        """
+        for transposed in (self.height > self.width, self.height <= self.width):
+            placements = self._pack_lanes(ships, transposed)
+            if placements is not None:
+                return placements
+        raise ValueError(f"the fleet doesn't fit into {self.height}x{self.width} field")
+
+    def _pack_lanes(self, ships, transposed: bool):
+        """
+        returns placements of the ships in the given order put into random lanes along rows
+        (columns if transposed), None if they don't fit
+        """
+        lines = self.width if transposed else self.height
+        length = self.height if transposed else self.width
+        # as many lanes fit as every other line has
+        lanes = [[] for _ in range(0, lines, 2)]
+        filled = [0 for _ in lanes]
+        for order, ship in enumerate(ships):
+            for index, lane in enumerate(lanes):
+                if filled[index] + ship.size <= length:
+                    lane.append((order, ship))
+                    filled[index] += ship.size + 1
+                    break
+            else:
+                return None
+
+        lanes = [lane for lane in lanes if lane]
+        self.rng.shuffle(lanes)
+        # k-th of the sorted distinct spots is moved by k, so the lanes are at least a line apart
+        spots = sorted(self.rng.sample(range(lines - len(lanes) + 1), len(lanes)))
+        placements = []
+        for k, (spot, lane) in enumerate(zip(spots, lanes)):
+            self.rng.shuffle(lane)
+            taken = sum(ship.size for _, ship in lane)
+            # the same trick spreads the free cells of the lane between the ships
+            gaps = sorted(self.rng.sample(range(length - taken + 1), len(lane)))
+            head = 0  # cells taken by the previous ships of the lane
+            for gap, (order, ship) in zip(gaps, lane):
+                if transposed:
+                    placements.append((order, (ship, gap + head, spot + k, True)))
+                else:
+                    placements.append((order, (ship, spot + k, gap + head, False)))
+                head += ship.size
+        return [placement for _, placement in sorted(placements, key=lambda placement: placement[0])]
+
+    def place(self, ships) -> None:
+        """
+        places ships on the field, the field is cleared and reused
+        """
+        placed = self.arrange(ships)
+        self.field.clear_cells()
+        for ship, y, x, is_vertical in placed:
+            self.field.place_ship(ship, y=y, x=x, is_vertical=is_vertical)
+
+    def arrange(self, ships):
+        """
+        returns (ship, y, x, is_vertical) of the ships without placing them on the field
+        """
+        ships = sorted(ships, key=lambda ship: ship.size, reverse=True)
+        for _ in range(self.SEARCHES):
+            self.stats['attempts'] += 1
+            placed = self._search(ships)
+            if placed is not None:
+                return placed
+        self.stats['fallbacks'] += 1
+        return self._pack(ships)
+
+    def _search(self, ships):
+        """
+        returns placements of the ships sorted by size, None if the backtracking budget is spent
+        """
+        self._reset()
+
+        placed = []  # (ship, y, x, is_vertical) in the order of placement
+        budget = self.BACKTRACKS_PER_SHIP * len(ships)
+        depth = 1  # how many ships to take back on the next failure
+        furthest = 0  # the most ships that were placed at once
+        while len(placed) < len(ships):
+            ship = ships[len(placed)]
+            spot = self._sample(ship.size)
+
+            if spot is None:
+                if budget <= 0:
+                    return None
+                budget -= 1
+                self.stats['backtracks'] += 1
+                # take back the last placed ships
+                for _ in range(min(depth, len(placed))):
+                    taken, y, x, is_vertical = placed.pop()
+                    self._unblock(taken.size, y, x, is_vertical)
+                depth *= 2
+                continue
+
+            y, x, is_vertical = spot
+            self._block(ship.size, y, x, is_vertical)
+            placed.append((ship, y, x, is_vertical))
+            self.stats['placed'] += 1
+            if len(placed) > furthest:
+                furthest = len(placed)
+                depth = 1
+
+        return placed
+
+
+class LanePlacer:
+    """
+    placement of the fleet on a sparse field
+
+    the free runs need a grid of the whole field, so huge fields get their ships in lanes
+    instead: random rows (or columns) with at least one empty line between them are filled
+    with the shuffled ships separated by random gaps. The work is proportional to the number
+    of ships and lines
+    """
+
+    FILL = 0.75  # part of the lanes taken by ships and their gaps
+    ATTEMPTS = 20  # the gaps are halved after every failed attempt
+
+    def __init__(self, field, rng=random):
+        self.field = field
+        self.rng = rng
+        self.stats = {'attempts': 0, 'placed': 0}
+
+    def place(self, ships) -> None:
+        """
+        places ships on the field, the field is cleared and reused
+        """
+        placed = self.arrange(ships)
+        self.field.clear_cells()
+        for ship, y, x, is_vertical in placed:
+            self.field.place_ship(ship, y=y, x=x, is_vertical=is_vertical)
+
+    def arrange(self, ships):
+        """
+        returns (ship, y, x, is_vertical) of the ships without placing them on the field
+        """
+        field = self.field
+        # lanes go along the longer side or along a random one of the square field
+        vertical = field.height > field.width or field.height == field.width and self.rng.random() < 0.5
+        length, across = (field.height, field.width) if vertical else (field.width, field.height)
+        if any(ship.size > length for ship in ships):
+            raise ValueError(f"the fleet doesn't fit into {field.height}x{field.width} field")
+
+        ships = list(ships)
+        self.rng.shuffle(ships)
+        need = sum(ship.size + 1 for ship in ships)
+        lanes = min((across + 1) // 2, -(-need // int(length * self.FILL)))
+        # at least one line is skipped after every lane
+        lines = [position + i for i, position in enumerate(sorted(self.rng.sample(range(across - lanes + 1), lanes)))]
+
+        gap = max(0, lanes * length - need) // len(ships)
+        for _ in range(self.ATTEMPTS):
+            self.stats['attempts'] += 1
+            placed = self._fill(ships, lines, length, gap)
+            if placed is not None:
+                break
+            gap //= 2
+        else:
+            raise ValueError(f"the fleet doesn't fit into {field.height}x{field.width} field")
+
+        self.stats['placed'] += len(placed)
+        if vertical:
+            return [(ship, position, line, True) for ship, line, position in placed]
+        return [(ship, line, position, False) for ship, line, position in placed]
+
+    def _fill(self, ships, lines, length: int, gap: int):
+        """
+        returns (ship, line, position) of the ships separated by gaps up to the given size, None if they don't fit
+        """
+        randrange = self.rng.randrange
+        placed = []
+        lane = 0
+        position = 0
+        for ship in ships:
+            position += randrange(gap + 1)
+            while position + ship.size > length:
+                lane += 1
+                if lane == len(lines):
+                    return None
+                position = randrange(gap + 1)
+            placed.append((ship, lines[lane], position))
+            position += ship.size + 1
+        return placed
+
+
+def _place_tile(job):
+    """
+    places ships of the given sizes on an empty tile, runs in a worker process
+
+    returns y, x and is_vertical of every ship in the order of the sizes
+    """
+    height, width, sizes, seed, sparse = job
+    # tiles of a sparse field are sparse too, so they are placed in lanes
+    field = (SparseField if sparse else Field)(height=height, width=width)
+    ships = list(Fleet(sizes))
+    placer = LanePlacer if field.is_sparse else FleetPlacer
+    positions = {id(ship): (y, x, is_vertical) for ship, y, x, is_vertical in placer(field, rng=random.Random(seed))
+                 .arrange(ships)}
+    return array('q', [value for ship in ships for value in positions[id(ship)]])
+
+
+class TilePlacer:
+    """
+    placement of the fleets of huge fields split into tiles
+
+    the field is split into a grid of tiles with empty one cell gutters between them, so ships
+    of different tiles never touch. Every tile gets a part of the fleet proportional to its area
+    and is placed by a worker process, ships of all the fleets are placed at the same time.
+    The tiles and their seeds depend only on the field and the rng, so a game is the same
+    whatever number of workers places it
+    """
+
+    MIN_CELLS = 1 << 20  # smaller fields are placed as a whole
+    TILES_PER_SIDE = 8  # the most tiles along a side
+    MIN_SIDE_SHIPS = 4  # tiles are at least this many longest ships high and wide
+
+    def __init__(self, rng=random, workers=None):
+        self.rng = rng
+        self.workers = os.cpu_count() if workers is None else workers
+        self.stats = {'tiles': 0}
+
+    @staticmethod
+    def fits(field) -> bool:
+        return field.height * field.width >= TilePlacer.MIN_CELLS
+
+    def _split(self, length: int, longest: int):
+        """
+        returns (start, length) of the tiles along a side
+        """
+        count = max(1, min(self.TILES_PER_SIDE, length // (self.MIN_SIDE_SHIPS * longest)))
+        space = length - (count - 1)  # without the gutters
+        bounds = [i * space // count for i in range(count + 1)]
+        # every tile is preceded by a gutter after the first one
+        return [(bounds[i] + i, bounds[i + 1] - bounds[i]) for i in range(count)]
+
+    def _tiles(self, field, longest: int):
+        """
+        returns (top, left, height, width) of the tiles of the field
+        """
+        return [(top, left, height, width)
+                for top, height in self._split(field.height, longest)
+                for left, width in self._split(field.width, longest)]
+
+    def _divide(self, ships, tiles):
+        """
+        returns ships of every tile, every tile gets cells of the ships in proportion to its area
+        """
+        area = sum(height * width for _, _, height, width in tiles)
+        cells = sum(ship.size for ship in ships)
+        rooms = [cells * height * width / area for _, _, height, width in tiles]  # cells left for the ships
+        sizes = {}
+        for ship in ships:
+            sizes.setdefault(ship.size, []).append(ship)
+
+        parts = [[] for _ in tiles]
+        for size in sorted(sizes, reverse=True):
+            group = sizes[size]
+            # ships are shared by the rooms, the remaining ones go to the tiles with the most room left
+            weights = [max(room, 0) for room in rooms]
+            total = sum(weights)
+            if total <= 0:
+                weights, total = [1] * len(tiles), len(tiles)
+            counts = [int(len(group) * weight / total) for weight in weights]
+            left = sorted(range(len(tiles)), key=lambda i: rooms[i] - counts[i] * size, reverse=True)
+            for i in left[:len(group) - sum(counts)]:
+                counts[i] += 1
+
+            start = 0
+            for i, count in enumerate(counts):
+                parts[i] += group[start:start + count]
+                rooms[i] -= count * size
+                start += count
+        return parts
+
+    def place(self, fleets) -> None:
+        """
+        places (field, ships) fleets, the fields should be empty
+        """
+        jobs = []
+        layouts = []  # (field, tile, ships of the tile) of every job
+        for field, ships in fleets:
+            tiles = self._tiles(field, max(ship.size for ship in ships))
+            for tile, part in zip(tiles, self._divide(ships, tiles)):
+                jobs.append((tile[2], tile[3], [ship.size for ship in part], self.rng.getrandbits(64),
+                             field.is_sparse))
+                layouts.append((field, tile, part))
+        self.stats['tiles'] += len(jobs)
+
+        if self.workers > 1:
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(jobs))) as executor:
+                results = list(executor.map(_place_tile, jobs))
+        else:
+            results = [_place_tile(job) for job in jobs]
+
+        # the tiles are stitched into the fields
+        for (field, (top, left, _, _), part), placed in zip(layouts, results):
+            for k, ship in enumerate(part):
+                y, x, is_vertical = placed[3 * k:3 * k + 3]
+                field.place_ship(ship, y=top + y, x=left + x, is_vertical=bool(is_vertical))
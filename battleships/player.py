@@ -1,169 +1,98 @@
 from field import Field
+from placement import FleetPlacer, LanePlacer
+from shootable import ShootableIndex
+from ai import RandomStrategy, STRATEGIES
+import profiling
 import random
 
 
 class Player:
-    def __init__(self, name: str, is_human: bool):
+    def __init__(self, name: str, is_human: bool, strategy: str = RandomStrategy.NAME, rng=None):
         self.name = name
         self.is_human = is_human
+        self.rng = rng or random.Random()  # random numbers of the game the player plays
+        self.strategy = None if is_human else STRATEGIES[strategy]()  # how AI picks cells to shoot at
         self.my_field = None  # to observe friendly ships
         self.enemy_field = None  # to shoot enemy ships
         self.ships = None
+        self.targets = None  # cells of enemy's field that can be shot, built on demand
+        self.minimap = None  # counters of the shots at enemy's field shown on the minimap, built by the screen
 
     def __repr__(self):
         return str(self.name)
 
-    def _get_rand_row(self):
+    def _init_targets(self) -> None:
         """
-        returns index of a random row from enemy's field
+        method for indexing the cells of enemy's field that can be shot
         """
-        return random.randint(0, self.enemy_field.height - 1)
+        with profiling.timed('targets_index'):
+            self.targets = ShootableIndex.from_states(self.enemy_field.states)
+        if profiling.enabled:
+            profiling.count('targets_index.cells', len(self.enemy_field.states))
 
-    def get_rand_shoot(self):
+    def prepare_targets(self) -> None:
         """
-        returns correct random indexes of cells to shoot at
+        indexes the cells of enemy's field that can be shot unless they are already indexed,
+        the cells of a sparse field aren't indexed
         """
-        cols = []
-        row = -1
-
-        # while there will be at least 1 shootable cell in the row
-        while len(cols) == 0:
-            # get random row
-            row = self._get_rand_row()
-            for index, cell in enumerate(self.enemy_field.cells[row]):
-                if cell.shootable():
-                    cols.append(index)
-
-        return row, random.choice(cols)
+        if self.targets is None and not self.enemy_field.is_sparse:
+            self._init_targets()
 
-    def _rand_ship_coordinates(self):
+    def forget_target(self, y: int, x: int) -> None:
         """
-        returns random coordinates for a ship
+        removes the cell of enemy's field from the shootable ones
         """
+        if self.targets is not None:
+            self.targets.discard(y * self.enemy_field.width + x)
 
-        y, x = random.randint(0, self.my_field.height - 1), random.randint(0, self.my_field.width - 1)
-        is_vertical = random.choice((True, False))
-
-        return y, x, is_vertical
-
-    def _can_place_ship(self, y, x):
+    def forget_targets(self, halo) -> None:
         """
-        checks if one can place a part of the ship on this cell
+        removes the cells of the ranges from the shootable ones
         """
+        if self.targets is not None:
+            for cells in halo:
+                for cell in cells:
+                    self.targets.discard(cell)
 
-        if self.my_field.cells[y][x].ship:
-            return False
-
-        if y - 1 >= 0:
-            if self.my_field.cells[y - 1][x].ship:
-                return False
-
-            if x + 1 < self.my_field.width and self.my_field.cells[y - 1][x + 1].ship:
-                return False
-
-            if x - 1 >= 0 and self.my_field.cells[y - 1][x - 1].ship:
-                return False
-
-        if y + 1 < self.my_field.height:
-            if self.my_field.cells[y + 1][x].ship:
-                return False
-
-            if x + 1 < self.my_field.width and self.my_field.cells[y + 1][x + 1].ship:
-                return False
-
-            if x - 1 >= 0 and self.my_field.cells[y + 1][x - 1].ship:
-                return False
+    def get_rand_shoot(self):
+        """
+        returns correct random indexes of cells to shoot at
+        """
+        if profiling.enabled:
+            profiling.count('random_shots')
+        # a sparse field has too many cells to index them
+        if self.enemy_field.is_sparse:
+            return self.enemy_field.random_shootable(self.rng)
 
-        if x + 1 < self.my_field.width and self.my_field.cells[y][x + 1].ship:
-            return False
+        if self.targets is None:
+            self._init_targets()
 
-        if x - 1 >= 0 and self.my_field.cells[y][x - 1].ship:
-            return False
+        return divmod(self.targets.choice(self.rng), self.enemy_field.width)
 
-        return True
+    def get_ai_shoot(self, game):
+        """
+        returns indexes of the cell AI decided to shoot at
+        """
+        return self.strategy.next_shot(self, game)
 
-    def display_field(self, sheight, swidth):
+    def display_field(self, sheight, swidth, style):
         """
         method for acquiring location of fields on the screen
         """
-        return self.my_field.display_field(sheight=sheight, swidth=swidth, on_top=True), \
-               self.enemy_field.display_field(sheight=sheight, swidth=swidth, on_top=False)
+        return self.my_field.display_field(sheight=sheight, swidth=swidth, on_top=True, style=style), \
+               self.enemy_field.display_field(sheight=sheight, swidth=swidth, on_top=False, style=style)
 
     def set_and_fill_field(self, field: Field):
         """
         method for setting player's field and randomly filling it with ships
         """
         self.my_field = field
-
-        is_filled = False  # has all ships been successfully set
-        while not is_filled:
-            is_filled = True
-
-            for ship in self.ships:
-                reset_after = 50
-                """
-                we try to fit a single ship 50 times
-                if we fail then we clear the field and start placing ships from the very beginning
-                """
-                while reset_after > 0:
-                    y, x, is_vertical = self._rand_ship_coordinates()  # coordinates of ship's head and its orientation
-                    is_placed = True  # checks if the ship was placed on the field
-
-                    # if ship's orientation is vertical
-                    if is_vertical:
-                        # break if there's not enough space
-                        if y + ship.size - 1 >= field.height:
-                            reset_after -= 1
-                            continue
-
-                        # check if all cells are available
-                        for i in range(ship.size):
-                            # break if not
-                            if not self._can_place_ship(y + i, x):
-                                is_placed = False
-                                break
-                        # fill the field if the ship was placed
-                        if is_placed:
-                            # set ship's head coordinates
-                            ship.y = y
-                            ship.x = x
-                            ship.is_vertical = is_vertical
-                            for i in range(ship.size):
-                                self.my_field.cells[y + i][x].set_ship(ship)
-                            break
-                        else:
-                            reset_after -= 1
-                            continue
-
-                    # if ship is placed horizontally
-                    else:
-                        # the process is similar to vertical placement
-                        if x + ship.size - 1 >= field.width:
-                            reset_after -= 1
-                            continue
-
-                        for i in range(ship.size):
-                            if not self._can_place_ship(y, x + i):
-                                is_placed = False
-                                break
-                        if is_placed:
-                            ship.y = y
-                            ship.x = x
-                            ship.is_vertical = is_vertical
-                            for i in range(ship.size):
-                                self.my_field.cells[y][x + i].set_ship(ship)
-                            break
-                        else:
-                            reset_after -= 1
-                            continue
-
-                if reset_after <= 0:
-                    is_filled = False
-                    break
-
-            # clear the field
-            if not is_filled:
-                self.my_field.clear_cells()
+        placer = (LanePlacer if field.is_sparse else FleetPlacer)(field, rng=self.rng)
+        with profiling.timed('placement'):
+            placer.place(self.ships)
+        if profiling.enabled:
+            for name, value in placer.stats.items():
+                profiling.count('placement.' + name, value)
 
     def set_ships(self, ships):
         """
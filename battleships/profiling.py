@@ -0,0 +1,99 @@
+"""
+counters and timings of the hot paths
+
+profiling is off unless it's enabled, the instrumented code checks `enabled` before
+counting anything, so the disabled profiler costs one lookup of a module attribute
+"""
+import contextlib
+import json
+import sys
+import time
+
+enabled = False
+counters = {}  # name -> value
+timings = {}  # name -> [number of the measurements, total seconds, the longest measurement]
+
+
+def count(name: str, value: int = 1) -> None:
+    counters[name] = counters.get(name, 0) + value
+
+
+def record(name: str, seconds: float) -> None:
+    timing = timings.setdefault(name, [0, 0.0, 0.0])
+    timing[0] += 1
+    timing[1] += seconds
+    timing[2] = max(timing[2], seconds)
+
+
+@contextlib.contextmanager
+def timed(name: str):
+    """
+    records duration of the block if profiling is enabled
+    """
+    if not enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def summary():
+    """
+    returns the counters and the timings in milliseconds
+    """
+    return {
+        'counters': dict(sorted(counters.items())),
+        'timings': {name: {'count': number, 'total_ms': round(total * 1000, 3),
+                           'mean_ms': round(total / number * 1000, 3), 'max_ms': round(longest * 1000, 3)}
+                    for name, (number, total, longest) in sorted(timings.items())},
+    }
+
+
+def format_summary():
+    """
+    returns lines of the summary table
+    """
+    stats = summary()
+    lines = ['counters:']
+    lines += [f"  {name:<28}{value:>12}" for name, value in stats['counters'].items()]
+    lines.append(f"timings:{'count':>24}{'total ms':>12}{'mean ms':>12}{'max ms':>12}")
+    lines += [f"  {name:<22}{t['count']:>8}{t['total_ms']:>12.1f}{t['mean_ms']:>12.3f}{t['max_ms']:>12.3f}"
+              for name, t in stats['timings'].items()]
+    return lines
+
+
+@contextlib.contextmanager
+def session(out=None, cprofile=None):
+    """
+    profiles the block
+
+    the summary is printed when the block ends or written as JSON to the out file,
+    stats of cProfile are written to the cprofile file if it's given (see pstats)
+    """
+    global enabled
+    enabled = True
+    counters.clear()
+    timings.clear()
+
+    profiler = None
+    if cprofile is not None:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield
+    finally:
+        enabled = False
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile)
+
+        if out is None:
+            print('\n'.join(format_summary()))
+        else:
+            with open(out, 'w') as file:
+                json.dump(summary(), file, indent=2)
+            print(f"profile is written to {out}", file=sys.stderr)
@@ -0,0 +1,50 @@
+import curses
+
+
+class Renderer:
+    """
+    draws frames of the game emitting only what changed since the last frame
+
+    the renderer is used instead of the screen by the drawing functions, it remembers
+    the text put at every position of the last frame and skips addstr if it's the same.
+    So a cursor move redraws two cells and a shot redraws the shot cells and the changed
+    rows of the stats. The whole screen is redrawn only when the layout changes (a sliding
+    window scrolls or the terminal is resized) or after something else was drawn on the screen
+    """
+
+    def __init__(self, screen: curses.window, style):
+        self.screen = screen
+        self.style = style  # symbols of the cells
+        self.frame = {}  # (y, x) -> text drawn in the last frame
+        self.layout = None  # what the last frame's positions depend on
+
+    def getmaxyx(self):
+        return self.screen.getmaxyx()
+
+    def invalidate(self) -> None:
+        """
+        the next frame will be drawn from scratch
+        """
+        self.layout = None
+
+    def begin_frame(self, layout) -> None:
+        """
+        starts a new frame, layout should change whenever positions of the drawn things change
+        """
+        if layout != self.layout:
+            self.layout = layout
+            self.frame = {}
+            self.screen.erase()
+
+    def addstr(self, y: int, x: int, text: str) -> None:
+        if self.frame.get((y, x)) == text:
+            return
+        self.frame[(y, x)] = text
+        self.screen.addstr(y, x, text)
+
+    def end_frame(self) -> None:
+        """
+        sends all the changes to the terminal at once
+        """
+        self.screen.noutrefresh()
+        curses.doupdate()
@@ -0,0 +1,47 @@
+from field import Field
+from storage import SAVES_PATH, seek_game
+import argparse
+import time
+
+# symbols of the cells indexed by their states
+SYMBOLS = '.#ox'
+MAX_WIDTH = 100  # wider fields aren't printed
+MAX_HEIGHT = 100  # taller fields aren't printed
+
+
+def _print_field(field) -> None:
+    # sparse fields have no states of all the cells
+    for y in range(field.height):
+        print(''.join(SYMBOLS[field.state(y, x)] for x in range(field.width)))
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(prog='battleships replay', description="shows a saved game after the given move")
+    parser.add_argument('slot', help="slot of the save")
+    parser.add_argument('--move', type=int, default=0, help="number of the moves made")
+    parser.add_argument('--saves', default=SAVES_PATH, help="folder with the saves")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        game = seek_game(args.slot, args.move, args.saves)
+    except (OSError, ValueError) as e:
+        print(f"can't replay the save: {e}")
+        return 1
+    elapsed = time.perf_counter() - start
+
+    print(f"move {game.moves_before} of {args.slot}, restored in {elapsed * 1000:.1f} ms")
+    seed = '-' if game.seed is None else game.seed  # the game can't be repeated by a seed
+    print(f"{game.map_height}x{game.map_width}, seed {seed}, turn of {game.players[game.turn % 2]}, "
+          f"ships left {game.alive_ships[0]}/{game.alive_ships[1]}")
+    if game.winner:
+        print(f"{game.winner} has won")
+
+    if game.map_width <= MAX_WIDTH and game.map_height <= MAX_HEIGHT:
+        for player in game.players:
+            print(f"\n{player}'s ships ({SYMBOLS[Field.STATE_SHIP]} ship, "
+                  f"{SYMBOLS[Field.STATE_SHOT_MISS]} miss, {SYMBOLS[Field.STATE_SHOT_HIT]} hit)")
+            _print_field(player.my_field)
+    else:
+        print(f"\nthe fields larger than {MAX_HEIGHT}x{MAX_WIDTH} aren't printed")
+    return 0
@@ -0,0 +1,270 @@
+"""
+game server hosting many matches over TCP
+
+the protocol is line based, every request is answered with one line starting with OK or ERR,
+coordinates start from 0, results of shots are MISS, HIT, SUNK or WIN
+
+NEW H W [STRATEGY] [SEED]   starts a match against AI -> OK <match> 0
+                            a finished match is left when a new one is started or joined
+HOST H W [SEED]             starts a match against a human -> OK <match> 0
+JOIN <match>                joins the hosted match -> OK <match> 1
+SHOOT Y X                   -> OK <result> [AI <y> <x> <result>]...
+                            moves of AI made until it missed or won follow the result
+STATS                       -> OK <alive ships of yours> <alive ships of the enemy>
+QUIT                        -> OK, the connection is closed
+
+in a match against a human the opponent gets lines EVENT JOINED and EVENT SHOT <y> <x> <result>.
+Matches without requests for IDLE_TIMEOUT seconds are evicted, their players get EVENT EVICTED and are disconnected
+"""
+from ai import STRATEGIES, RandomStrategy
+from game import Game
+import argparse
+import asyncio
+import itertools
+import time
+
+MAX_SIDE = 1000  # the largest field of a match
+IDLE_TIMEOUT = 300.0  # seconds
+
+
+class ProtocolError(Exception):
+    pass
+
+
+class Match:
+    """
+    state of a match, its game is changed by one request at a time
+    """
+
+    def __init__(self, match_id: int, game: Game, vs_ai: bool):
+        self.id = match_id
+        self.game = game
+        self.vs_ai = vs_ai
+        self.writers = [None, None]  # connections of the players by their seats
+        self.lock = asyncio.Lock()
+        self.last_active = time.monotonic()
+
+    def notify(self, seat: int, line: str) -> None:
+        writer = self.writers[seat]
+        if writer is not None and not writer.is_closing():
+            writer.write(line.encode() + b'\n')
+
+
+def shoot(game: Game, seat: int, y: int, x: int) -> str:
+    """
+    the player at the seat shoots at the cell, returns the result of the shot
+    """
+    field = game.players[seat].enemy_field
+    field.y_cur, field.x_cur = y, x
+    succ, hit = game.player_shoot()
+    if not succ:
+        raise ProtocolError("the cell was shot before")
+    if not hit:
+        game.turn += 1
+        return 'MISS'
+
+    # the same player shoots again after a hit
+    game.check_victory()
+    if game.is_finished:
+        return 'WIN'
+    ship = game.players[1 - seat].my_field.ship_at(y, x)
+    return 'SUNK' if ship.health <= 0 else 'HIT'
+
+
+class Server:
+    def __init__(self, max_side: int = MAX_SIDE, idle_timeout: float = IDLE_TIMEOUT):
+        self.max_side = max_side
+        self.idle_timeout = idle_timeout
+        self.matches = {}  # id -> match
+        self.ids = itertools.count(1)
+
+    async def _new_game(self, height: int, width: int, seed, **players) -> Game:
+        if not (5 <= height <= self.max_side and 5 <= width <= self.max_side):
+            raise ProtocolError(f"sides of the field should be from 5 to {self.max_side}")
+        game = Game(height, width, seed=seed)
+        # placing ships and indexing the cells AI shoots at take a while on a large field,
+        # the loop keeps serving meanwhile
+        await asyncio.get_running_loop().run_in_executor(None, self._prepare, game, players)
+        return game
+
+    @staticmethod
+    def _prepare(game: Game, players) -> None:
+        game.prepare_game(**players)
+        for player in game.players:
+            if not player.is_human:
+                player.prepare_targets()
+
+    def _register(self, game: Game, vs_ai: bool) -> Match:
+        match = Match(next(self.ids), game, vs_ai)
+        self.matches[match.id] = match
+        return match
+
+    @staticmethod
+    def _ai_moves(game: Game):
+        """
+        AI shoots until it misses, returns its moves
+
+        it's run in the executor, the lock of the match keeps other requests away from the game meanwhile
+        """
+        moves = []
+        while not game.is_finished and game.turn % 2 == 1:
+            y, x = game.players[1].get_ai_shoot(game)
+            moves.append(f'AI {y} {x} {shoot(game, 1, y, x)}')
+        return moves
+
+    async def _shoot(self, match: Match, seat: int, args):
+        game = match.game
+        y, x = _ints(args, 2)
+        if not (0 <= y < game.map_height and 0 <= x < game.map_width):
+            raise ProtocolError("the cell is out of the field")
+        if game.is_finished:
+            raise ProtocolError("the match is finished")
+        if game.turn % 2 != seat or match.writers[1] is None and not match.vs_ai:
+            raise ProtocolError("it's not your turn")
+
+        result = shoot(game, seat, y, x)
+        if match.vs_ai:
+            moves = await asyncio.get_running_loop().run_in_executor(None, self._ai_moves, game)
+            return ' '.join([result] + moves)
+        match.notify(1 - seat, f'EVENT SHOT {y} {x} {result}')
+        return result
+
+    async def _request(self, line: str, seat, writer):
+        """
+        returns the answer to the request and the seat of the connection
+        """
+        command, *args = line.split()
+        command = command.upper()
+        match = self.matches.get(seat[0]) if seat else None
+
+        if command in ('NEW', 'HOST', 'JOIN'):
+            if match is not None and not match.game.is_finished:
+                raise ProtocolError("finish the current match first")
+            self._leave(seat, writer)
+
+        if command in ('NEW', 'HOST'):
+            height, width = _ints(args[:2], 2)
+            strategy = RandomStrategy.NAME
+            rest = args[2:]
+            if command == 'NEW' and rest and not rest[0].lstrip('-').isdigit():
+                strategy = rest.pop(0)
+                if strategy not in STRATEGIES:
+                    raise ProtocolError(f"unknown strategy, available: {', '.join(STRATEGIES)}")
+            seed = _ints(rest, 1)[0] if rest else None
+
+            if command == 'NEW':
+                game = await self._new_game(height, width, seed, player_name="Player", ai_strategy=strategy)
+            else:
+                game = await self._new_game(height, width, seed, player_name="Player 1", opponent_name="Player 2")
+            match = self._register(game, vs_ai=command == 'NEW')
+            match.writers[0] = writer
+            return f'{match.id} 0', (match.id, 0)
+
+        if command == 'JOIN':
+            match = self.matches.get(_ints(args, 1)[0])
+            if match is None or match.vs_ai or match.writers[1] is not None:
+                raise ProtocolError("no such match to join")
+            match.writers[1] = writer
+            match.last_active = time.monotonic()
+            match.notify(0, 'EVENT JOINED')
+            return f'{match.id} 1', (match.id, 1)
+
+        if command == 'QUIT':
+            return '', seat
+
+        if match is None:
+            raise ProtocolError("start or join a match first")
+        match.last_active = time.monotonic()
+
+        async with match.lock:
+            if command == 'SHOOT':
+                return await self._shoot(match, seat[1], args), seat
+            if command == 'STATS':
+                alive = match.game.num_alive_ships()
+                return f'{sum(alive[seat[1]])} {sum(alive[1 - seat[1]])}', seat
+        raise ProtocolError(f"unknown command {command}")
+
+    def _leave(self, seat, writer) -> None:
+        match = self.matches.get(seat[0]) if seat else None
+        if match is None or match.writers[seat[1]] is not writer:
+            return
+        match.writers[seat[1]] = None
+        # nobody plays the match anymore
+        if match.writers == [None, None]:
+            del self.matches[match.id]
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        seat = None  # (match id, seat) of the connection
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                line = line.decode(errors='replace').strip()
+                if not line:
+                    continue
+                try:
+                    answer, seat = await self._request(line, seat, writer)
+                    writer.write(f'OK {answer}'.rstrip().encode() + b'\n')
+                except (ProtocolError, ValueError) as e:
+                    writer.write(f'ERR {e}'.encode() + b'\n')
+                await writer.drain()
+                if line.split()[0].upper() == 'QUIT':
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._leave(seat, writer)
+            writer.close()
+
+    async def evict_idle(self) -> None:
+        """
+        drops the matches without requests for idle_timeout seconds
+        """
+        while True:
+            await asyncio.sleep(self.idle_timeout / 4)
+            now = time.monotonic()
+            for match in [match for match in self.matches.values() if now - match.last_active > self.idle_timeout]:
+                del self.matches[match.id]
+                for seat, writer in enumerate(match.writers):
+                    if writer is not None:
+                        match.notify(seat, 'EVENT EVICTED')
+                        writer.close()
+
+    async def serve(self, host: str, port: int, ready=None) -> None:
+        server = await asyncio.start_server(self.handle, host, port)
+        evictor = asyncio.create_task(self.evict_idle())
+        if ready is not None:
+            ready(server)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            evictor.cancel()
+
+
+def _ints(args, count: int):
+    if len(args) < count:
+        raise ProtocolError(f"{count} numbers expected")
+    try:
+        return [int(arg) for arg in args[:count]]
+    except ValueError:
+        raise ProtocolError(f"{count} numbers expected")
+
+
+def main(argv) -> int:
+    parser = argparse.ArgumentParser(prog='battleships serve', description="hosts matches over TCP")
+    parser.add_argument('--host', default='127.0.0.1', help="address to listen on")
+    parser.add_argument('--port', type=int, default=7000, help="port to listen on")
+    parser.add_argument('--max-side', type=int, default=MAX_SIDE, help="the largest side of a field")
+    parser.add_argument('--idle-timeout', type=float, default=IDLE_TIMEOUT,
+                        help="seconds after which matches without requests are evicted")
+    args = parser.parse_args(argv)
+
+    server = Server(max_side=args.max_side, idle_timeout=args.idle_timeout)
+    ready = lambda tcp: print(f"serving on {args.host}:{tcp.sockets[0].getsockname()[1]}", flush=True)
+    try:
+        asyncio.run(server.serve(args.host, args.port, ready=ready))
+    except KeyboardInterrupt:
+        pass
+    return 0
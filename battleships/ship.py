@@ -1,14 +1,124 @@
+from array import array
+
+
+class Fleet:
+    """
+    ships stored by columns, a ship is its index in the columns (ship id)
+
+    huge maps have millions of ships, so their sizes, health, coordinates and orientations are kept
+    in arrays rather than in an object per ship. Ship views are made when they are asked for
+    """
+
+    def __init__(self, sizes=()):
+        """
+        the ships of the given sizes aren't placed, their coordinates are -1
+        """
+        self.sizes = array('i', sizes)
+        self.health = array('i', self.sizes)
+        self.ys = array('i', [-1]) * len(self.sizes)
+        self.xs = array('i', [-1]) * len(self.sizes)
+        self.vertical = bytearray(len(self.sizes))
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __getitem__(self, ship_id: int):
+        if not 0 <= ship_id < len(self.sizes):
+            raise IndexError(f"no ship {ship_id}")
+        return Ship(self, ship_id)
+
+    def __iter__(self):
+        return (Ship(self, ship_id) for ship_id in range(len(self.sizes)))
+
+    def add(self, size: int, y: int, x: int, is_vertical: bool, health=None) -> int:
+        """
+        adds a ship with its head at (y, x), returns its id
+        """
+        self.sizes.append(size)
+        self.health.append(size if health is None else health)
+        self.ys.append(y)
+        self.xs.append(x)
+        self.vertical.append(is_vertical)
+        return len(self.sizes) - 1
+
+    def hit(self, ship_id: int) -> int:
+        """
+        takes a cell of the ship, returns its health left
+        """
+        self.health[ship_id] -= 1
+        return self.health[ship_id]
+
+    def rows(self):
+        """
+        returns an iterator over (size, y, x, is_vertical, health) of the ships
+        """
+        return zip(self.sizes, self.ys, self.xs, self.vertical, self.health)
+
+    def alive_by_size(self, longest: int):
+        """
+        returns number of alive ships of every size from 1 to longest
+        """
+        alive = [0] * longest
+        for size, health in zip(self.sizes, self.health):
+            if health > 0:
+                alive[size - 1] += 1
+        return alive
+
+    def copy(self):
+        fleet = Fleet()
+        fleet.sizes, fleet.health = array('i', self.sizes), array('i', self.health)
+        fleet.ys, fleet.xs, fleet.vertical = array('i', self.ys), array('i', self.xs), bytearray(self.vertical)
+        return fleet
+
+
 class Ship:
+    """
+    view of a ship of a fleet, it's made on demand and stores nothing but the fleet and the ship id
+    """
+
+    __slots__ = ('fleet', 'id')
+
+    def __init__(self, fleet: Fleet, ship_id: int):
+        self.fleet = fleet
+        self.id = ship_id
+
+    @property
+    def size(self) -> int:
+        return self.fleet.sizes[self.id]
 
-    def __init__(self, size):
-        self.size = size
-        self.health = size
-        self.x = self.y = self.is_vertical = None
+    @property
+    def health(self) -> int:
+        return self.fleet.health[self.id]
+
+    @health.setter
+    def health(self, health: int):
+        self.fleet.health[self.id] = health
+
+    @property
+    def y(self) -> int:
+        return self.fleet.ys[self.id]
+
+    @property
+    def x(self) -> int:
+        return self.fleet.xs[self.id]
+
+    @property
+    def is_vertical(self) -> bool:
+        return bool(self.fleet.vertical[self.id])
 
     def set_coordinates(self, y: int, x: int, is_vertical: bool):
-        self.y = y
-        self.x = x
-        self.is_vertical = is_vertical
+        self.fleet.ys[self.id] = y
+        self.fleet.xs[self.id] = x
+        self.fleet.vertical[self.id] = is_vertical
+
+    def cells(self):
+        """
+        returns coordinates of the cells taken by the ship
+        """
+        y, x, size = self.y, self.x, self.size
+        if self.is_vertical:
+            return [(y + i, x) for i in range(size)]
+        return [(y, x + i) for i in range(size)]
 
     def __repr__(self):
         return str(self.y) + " " + str(self.x) + " " + str(self.health) + " " + str(self.size)
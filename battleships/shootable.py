@@ -0,0 +1,61 @@
+from array import array
+from itertools import compress
+import random
+
+# maps state of a cell to 1 if it can be shot and to 0 otherwise
+_SHOOTABLE = bytes([1] + [0] * 255)
+
+
+class ShootableIndex:
+    """
+    set of cells that can be shot, cells are stored as y * width + x
+
+    cells are kept in an array with the position of every cell stored in a map,
+    a removed cell is swapped with the last one, so both removing a cell and
+    picking a random one take constant time
+    """
+
+    def __init__(self, size: int, cells=None):
+        if cells is None:
+            self.cells = array('i', range(size))
+            self.positions = array('i', range(size))
+        else:
+            self.cells = array('i', cells)
+            self.positions = array('i', [-1]) * size
+            for position, cell in enumerate(self.cells):
+                self.positions[cell] = position
+
+    @staticmethod
+    def from_states(states):
+        """
+        returns index of the cells of the field whose state is empty
+        """
+        if not any(states):
+            return ShootableIndex(len(states))
+        # states mapped from a save can't be translated
+        if not isinstance(states, (bytes, bytearray)):
+            states = states[:]
+        return ShootableIndex(len(states), compress(range(len(states)), states.translate(_SHOOTABLE)))
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __contains__(self, cell: int):
+        return self.positions[cell] != -1
+
+    def discard(self, cell: int) -> None:
+        """
+        removes the cell if it's in the index
+        """
+        position = self.positions[cell]
+        if position == -1:
+            return
+
+        last = self.cells.pop()
+        if last != cell:
+            self.cells[position] = last
+            self.positions[last] = position
+        self.positions[cell] = -1
+
+    def choice(self, rng=random) -> int:
+        return self.cells[rng.randrange(len(self.cells))]
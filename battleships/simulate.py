@@ -0,0 +1,126 @@
+from concurrent.futures import ProcessPoolExecutor
+from game import Game
+from ai import STRATEGIES, RandomStrategy
+import argparse
+import json
+import math
+import os
+import time
+
+BATCH_SIZE = 64  # games played by a worker per task
+
+
+def play_match(height: int, width: int, strategies, seed: int):
+    """
+    plays a game between two AI players to the end without any UI
+
+    returns number of shots made by the winner, index of the winner and time spent on placing ships
+    """
+    start = time.perf_counter()
+    game = Game(height, width, seed=seed)
+    game.prepare_game(player_name="AI 1", player_strategy=strategies[0], ai_strategy=strategies[1])
+    placement_time = time.perf_counter() - start
+
+    shots = [0, 0]
+    while not game.is_finished:
+        shooter = game.turn % 2
+        _, hit = game.ai_shoot()
+        shots[shooter] += 1
+        # the same player shoots again after a hit
+        if hit:
+            game.check_victory()
+        else:
+            game.turn += 1
+
+    winner = game.players.index(game.winner)
+    return shots[winner], winner, placement_time
+
+
+def _play_batch(args):
+    height, width, strategies, seeds = args
+    return [play_match(height, width, strategies, seed) for seed in seeds]
+
+
+def _percentile(values, q: float):
+    """
+    nearest-rank percentile of sorted values
+    """
+    return values[max(0, math.ceil(q / 100 * len(values)) - 1)]
+
+
+def simulate(games: int, height: int, width: int, workers: int, strategies, seed: int = 0):
+    """
+    plays the games on a pool of worker processes and returns aggregate statistics
+    """
+    seeds = range(seed, seed + games)
+    batches = [(height, width, strategies, seeds[i:i + BATCH_SIZE]) for i in range(0, games, BATCH_SIZE)]
+
+    start = time.perf_counter()
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in executor.map(_play_batch, batches):
+            results.extend(batch)
+    elapsed = time.perf_counter() - start
+
+    shots = sorted(shots for shots, _, _ in results)
+    placement = sorted(placement_time for _, _, placement_time in results)
+    wins = [0, 0]
+    for _, winner, _ in results:
+        wins[winner] += 1
+
+    return {
+        'games': games,
+        'size': f'{height}x{width}',
+        'workers': workers,
+        'strategies': list(strategies),
+        'seconds': round(elapsed, 3),
+        'games_per_sec': round(games / elapsed, 2),
+        'shots_to_win': {
+            'mean': round(sum(shots) / len(shots), 2),
+            'p50': _percentile(shots, 50),
+            'p99': _percentile(shots, 99),
+        },
+        'wins': wins,
+        'placement_sec': {
+            'mean': round(sum(placement) / len(placement), 6),
+            'p50': round(_percentile(placement, 50), 6),
+            'p99': round(_percentile(placement, 99), 6),
+        },
+    }
+
+
+def _size(value: str):
+    try:
+        height, width = (int(n) for n in value.lower().split('x'))
+    except ValueError:
+        raise argparse.ArgumentTypeError("size should look like NxK")
+    if height < 5 or width < 5:
+        raise argparse.ArgumentTypeError("N >= 5 and K >= 5 are required")
+    return height, width
+
+
+def _strategies(value: str):
+    names = value.split(',')
+    if len(names) == 1:
+        names *= 2
+    if len(names) != 2 or any(name not in STRATEGIES for name in names):
+        raise argparse.ArgumentTypeError(f"expected one or two of {', '.join(STRATEGIES)} separated by a comma")
+    return names
+
+
+def main(argv) -> None:
+    parser = argparse.ArgumentParser(prog='battleships simulate', description="plays AI vs AI games without UI")
+    parser.add_argument('--games', type=int, default=1000, help="number of games to play")
+    parser.add_argument('--size', type=_size, default=(10, 10), help="field size, NxK")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument('--strategies', type=_strategies, default=[RandomStrategy.NAME] * 2,
+                        help=f"AI of both players, e.g. hunt,random (available: {', '.join(STRATEGIES)})")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the first game, next games use next seeds")
+    args = parser.parse_args(argv)
+    if args.games < 1 or args.workers < 1:
+        parser.error("--games and --workers should be positive")
+
+    height, width = args.size
+    stats = simulate(games=args.games, height=height, width=width, workers=args.workers,
+                     strategies=args.strategies, seed=args.seed)
+    print(json.dumps(stats, indent=2))
@@ -0,0 +1,738 @@
+"""
+saving and loading games
+
+a save is a zlib stream of the following little-endian records:
+
+header      magic b'BTLS', version u16, height u32, width u32, turn i64,
+            is_finished u8, winner i8 (index of the player, -1 if none),
+            size of the longest ship u32, seed of the game u64 (since version 2),
+            layout of the cells u8 (since version 3): 0 packed, 1 sparse, 2 mapped (since version 4),
+            has seed u8 (since version 5): 0 if the game can't be repeated by a seed, the seed is 0 then
+2 players   name length u16, name (utf-8), is_human u8,
+            AI strategy length u8, AI strategy (ascii, empty for humans),
+            cursor y u32, cursor x u32, window top u32, window left u32 of my field,
+            the same four values of enemy's field,
+            number of ships u32, fleet table: size u32, y u32, x u32, is_vertical u8, health u32
+            in the order of the ship ids, states of my field's cells, states of enemy's field's cells
+
+states of the cells are packed by 4 into a byte, 2 bits per cell, row by row,
+the first cell of every four takes the lowest bits. Sparse fields store only the shot cells:
+their number u64, then y * width + x u64 and state u8 of every one, ship cells follow from the fleet.
+Mapped cells are stored out of the save in CELLS records of the journal, instead of the states
+the player has offsets of the payloads u64: states and ship ids of my field, then of enemy's field.
+Enemy's field has no ships, the offset of its ship ids is NO_CELLS (since version 6, before it they were stored)
+
+every save is kept in its own slot, saves/<slot>.journal, the index file lists the slots
+with their metadata, so they can be shown without reading any board.
+A slot is a journal (see journal.py) of the following records:
+
+KEYFRAME    number of the move u64, the game after the move in the format above
+MOVES       number of the first move u64, moves: shooter u8, y u32, x u32
+POSITION    turn i64, cursors and windows of the fields like in the format above
+CELLS       states (u8) or ship ids (i32) of all the cells of a field row by row, aligned to a page
+
+a journal of a new game starts with the keyframe of its initial fleets, a journal of
+a game continued from another slot starts with the keyframe of the moment it was saved.
+Every save appends the moves made since the previous save and the position, a keyframe
+is appended once in KEYFRAME_MOVES moves, so a game is loaded from the last keyframe
+and the moves after it.
+
+Keyframes of the fields of MAPPED_CELLS cells and more keep their cells in CELLS records
+appended before them, the records are mapped copy-on-write when the game is loaded, so only
+the pages of the cells the game touches are read. Ship ids don't change during the game,
+so the keyframes saved by the same journal refer to the same ship ids
+"""
+from array import array
+from field import Field, SparseField
+from game import Game
+from player import Player
+from ship import Fleet
+import copy
+import io
+import journal
+import json
+import os
+import profiling
+import struct
+import threading
+import time
+import zlib
+
+SAVES_PATH = 'saves'
+INDEX_NAME = 'index.json'  # metadata of all the saves
+AUTOSAVE_SLOT = 'autosave'
+
+MAGIC = b'BTLS'
+VERSION = 6
+VERSIONS = (1, 2, 3, 4, 5, 6)  # versions which can be read
+
+# layouts of the cells
+CELLS_PACKED = 0
+CELLS_SPARSE = 1
+CELLS_MAPPED = 2
+MAPPED_CELLS = 1 << 20  # fields with more cells are mapped
+NO_CELLS = 0  # offset of the mapped cells which aren't stored, no payload starts at 0
+
+_HEADER = struct.Struct('<4sHIIqBbI')
+_WINDOW = struct.Struct('<IIII')
+_SHIP = struct.Struct('<IIIBI')
+_COUNT = struct.Struct('<I')
+_SEED = struct.Struct('<Q')
+_SHOT = struct.Struct('<QB')
+_OFFSETS = struct.Struct('<QQQQ')
+
+# types of the records of the journal
+KEYFRAME = 1
+MOVES = 2
+POSITION = 3
+CELLS = 4
+
+KEYFRAME_MOVES = 1000  # moves between keyframes at least, a keyframe is taken once in a 1/50 of the cells
+
+_MOVE_NUMBER = struct.Struct('<Q')
+_MOVE = struct.Struct('<BII')
+_POSITION = struct.Struct('<q' + 'I' * 16)
+
+CHUNK = 1 << 20  # cells packed at once, multiple of 4
+
+# tables moving 2-bit states to their place in a packed byte and back
+_PACK = [bytes((state << 2 * k) & 0xFF for state in range(256)) for k in range(4)]
+_UNPACK = [bytes((byte >> 2 * k) & 3 for byte in range(256)) for k in range(4)]
+# cells of the ships, shot or not
+_SHIPS = bytes(state in (Field.STATE_SHIP, Field.STATE_SHOT_HIT) for state in range(256))
+
+
+class _Writer:
+    """
+    compresses everything written to the file
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.compressor = zlib.compressobj(6)
+
+    def write(self, data) -> None:
+        self.file.write(self.compressor.compress(data))
+
+    def close(self) -> None:
+        self.file.write(self.compressor.flush())
+
+
+class _Reader:
+    """
+    decompresses the file while it's being read
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.decompressor = zlib.decompressobj()
+        self.buffer = bytearray()
+
+    def read(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            chunk = self.file.read(CHUNK)
+            if not chunk:
+                self.buffer += self.decompressor.flush()
+                if len(self.buffer) < size:
+                    raise ValueError("the save is truncated")
+                break
+            self.buffer += self.decompressor.decompress(chunk)
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+
+def pack_states(states) -> bytes:
+    """
+    packs states of the cells by 4 into a byte
+    """
+    if len(states) % 4:
+        states = bytes(states) + bytes(4 - len(states) % 4)
+    # the parts take different bits, so adding them up is the same as or-ing them
+    value = 0
+    for k in range(4):
+        value += int.from_bytes(states[k::4].translate(_PACK[k]), 'little')
+    return value.to_bytes(len(states) // 4, 'little')
+
+
+def unpack_states(packed: bytes, size: int) -> bytearray:
+    """
+    unpacks states of the given number of cells
+    """
+    states = bytearray(len(packed) * 4)
+    for k in range(4):
+        states[k::4] = packed.translate(_UNPACK[k])
+    del states[size:]
+    return states
+
+
+def _write_string(writer: _Writer, text: str, length_format: str) -> None:
+    data = text.encode('utf-8')
+    writer.write(struct.pack(length_format, len(data)) + data)
+
+
+def _read_string(reader: _Reader, length_format: str) -> str:
+    length, = struct.unpack(length_format, reader.read(struct.calcsize(length_format)))
+    return reader.read(length).decode('utf-8')
+
+
+def _write_states(writer: _Writer, states) -> None:
+    # shot cells of a sparse field
+    if isinstance(states, dict):
+        writer.write(_SEED.pack(len(states)))
+        shots = list(states.items())
+        for start in range(0, len(shots), CHUNK):
+            writer.write(b''.join(_SHOT.pack(cell, state) for cell, state in shots[start:start + CHUNK]))
+        return
+
+    for start in range(0, len(states), CHUNK):
+        writer.write(pack_states(states[start:start + CHUNK]))
+
+
+def _read_states(reader: _Reader, size: int) -> bytearray:
+    states = bytearray()
+    for start in range(0, size, CHUNK):
+        cells = min(CHUNK, size - start)
+        states += unpack_states(reader.read((cells + 3) // 4), cells)
+    return states
+
+
+def _read_shots(reader: _Reader):
+    count, = _SEED.unpack(reader.read(_SEED.size))
+    shots = {}
+    for start in range(0, count, CHUNK):
+        shots.update(_SHOT.iter_unpack(reader.read(min(CHUNK, count - start) * _SHOT.size)))
+    return shots
+
+
+def _copy_states(field):
+    return dict(field.shots) if field.is_sparse else bytes(field.states)
+
+
+class Snapshot:
+    """
+    copy of everything stored in a save
+
+    it's taken on the game thread, so the game can go on while the copy is being written
+    """
+
+    def __init__(self, game: Game):
+        self.height = game.map_height
+        self.width = game.map_width
+        self.turn = game.turn
+        self.is_finished = game.is_finished
+        self.winner = game.players.index(game.winner) if game.winner else -1
+        self.longest_ship_sz = game.longest_ship_sz
+        self.seed = game.seed
+        self.sparse = game.players[0].my_field.is_sparse
+        self.mapped = not self.sparse and self.height * self.width >= MAPPED_CELLS
+        # ship ids don't change after the ships are placed, so they aren't copied
+        self.ship_ids = [player.my_field.ship_ids for player in game.players] if self.mapped else None
+        self.alive_ships = list(game.alive_ships)
+        self.moves = game.moves_before + len(game.moves)  # number of the moves made
+        self.players = [(player.name, player.is_human, '' if player.is_human else player.strategy.NAME,
+                         [(field.y_cur, field.x_cur, field.border_top, field.border_left)
+                          for field in (player.my_field, player.enemy_field)],
+                         player.my_field.ships.copy(),
+                         _copy_states(player.my_field), _copy_states(player.enemy_field))
+                        for player in game.players]
+
+    def initial(self):
+        """
+        returns the snapshot of the game before the first move
+        """
+        initial = copy.copy(self)
+        initial.turn = initial.moves = 0
+        initial.is_finished = False
+        initial.winner = -1
+        initial.players = []
+        for name, is_human, strategy, windows, fleet, my_states, enemy_states in self.players:
+            # every ship is whole
+            fleet = fleet.copy()
+            fleet.health[:] = fleet.sizes
+            initial.players.append((name, is_human, strategy, [(0, 0, 0, 0)] * 2, fleet,
+                                    {} if self.sparse else my_states.translate(_SHIPS),
+                                    {} if self.sparse else bytes(len(enemy_states))))
+        initial.alive_ships = [len(player[4]) for player in self.players]
+        return initial
+
+    def position(self) -> bytes:
+        """
+        returns payload of the position record
+        """
+        return _POSITION.pack(self.turn, *(value for player in self.players for window in player[3] for value in window))
+
+    def keyframe(self, offsets=None) -> bytes:
+        """
+        returns payload of the keyframe record, offsets of the mapped cells are given for mapped keyframes
+        """
+        data = io.BytesIO()
+        data.write(_MOVE_NUMBER.pack(self.moves))
+        write_snapshot(self, data, offsets)
+        return data.getvalue()
+
+    def mapped_states(self):
+        """
+        returns states of my field and enemy's field of every player for CELLS records
+        """
+        return [states for player in self.players for states in player[5:]]
+
+    def mapped_ship_ids(self):
+        """
+        returns ship ids of my field of every player for CELLS records
+        """
+        return [memoryview(ship_ids).cast('B') for ship_ids in self.ship_ids]
+
+    def metadata(self, slot: str):
+        """
+        returns the entry of the save in the index
+        """
+        human = next((player for player in self.players if player[1]), self.players[0])
+        return {
+            'slot': slot,
+            'player': human[0],
+            'height': self.height,
+            'width': self.width,
+            'turn': self.turn,
+            'timestamp': time.time(),
+            'ships_left': self.alive_ships,
+            'seed': self.seed,
+        }
+
+
+def _write_player(writer: _Writer, player, offsets=None) -> None:
+    name, is_human, strategy, windows, fleet, my_states, enemy_states = player
+    _write_string(writer, name, '<H')
+    writer.write(bytes([is_human]))
+    _write_string(writer, strategy, '<B')
+    for window in windows:
+        writer.write(_WINDOW.pack(*window))
+
+    writer.write(_COUNT.pack(len(fleet)))
+    writer.write(b''.join(_SHIP.pack(*ship) for ship in fleet.rows()))
+    if offsets is not None:
+        writer.write(_OFFSETS.pack(*offsets))
+        return
+    _write_states(writer, my_states)
+    _write_states(writer, enemy_states)
+
+
+def _read_player(reader: _Reader, height: int, width: int, rng, layout: int, map_cells) -> Player:
+    name = _read_string(reader, '<H')
+    is_human = bool(reader.read(1)[0])
+    strategy = _read_string(reader, '<B')
+    player = Player(name=name, is_human=is_human, rng=rng, **({} if is_human else {'strategy': strategy}))
+
+    windows = [_WINDOW.unpack(reader.read(_WINDOW.size)) for _ in range(2)]
+    count, = _COUNT.unpack(reader.read(_COUNT.size))
+    rows = list(_SHIP.iter_unpack(reader.read(count * _SHIP.size)))
+
+    if layout == CELLS_MAPPED:
+        my_states, my_ship_ids, enemy_states, enemy_ship_ids = _OFFSETS.unpack(reader.read(_OFFSETS.size))
+        cells = height * width
+        player.my_field, player.enemy_field = (
+            Field(height=height, width=width, states=map_cells(states, cells),
+                  ship_ids=None if ship_ids == NO_CELLS else memoryview(map_cells(ship_ids, 4 * cells)).cast('i'))
+            for states, ship_ids in ((my_states, my_ship_ids), (enemy_states, enemy_ship_ids)))
+    else:
+        field_type = SparseField if layout == CELLS_SPARSE else Field
+        player.my_field = field_type(height=height, width=width)
+        player.enemy_field = field_type(height=height, width=width)
+    for field, window in zip((player.my_field, player.enemy_field), windows):
+        field.y_cur, field.x_cur, field.border_top, field.border_left = window
+
+    fleet = Fleet([size for size, *_ in rows])
+    fleet.health = array('i', [health for *_, health in rows])
+    for ship, (_, y, x, is_vertical, _) in zip(fleet, rows):
+        # mapped cells are marked already
+        if layout == CELLS_MAPPED:
+            player.my_field.restore_ship(ship, y=y, x=x, is_vertical=bool(is_vertical))
+        else:
+            player.my_field.place_ship(ship, y=y, x=x, is_vertical=bool(is_vertical))
+    player.set_ships(player.my_field.ships)
+
+    # states are restored after the ships since placing a ship marks its cells
+    for field in (player.my_field, player.enemy_field):
+        if layout == CELLS_SPARSE:
+            field.shots = _read_shots(reader)
+        elif layout == CELLS_PACKED:
+            field.states[:] = _read_states(reader, height * width)
+    return player
+
+
+def write_snapshot(snapshot: Snapshot, file, offsets=None) -> None:
+    """
+    writes the snapshot of a game into a binary file object
+
+    cells are mapped if offsets of their CELLS records are given: states of my field and enemy's field
+    of every player, then ship ids of my field of every player
+    """
+    writer = _Writer(file)
+    writer.write(_HEADER.pack(MAGIC, VERSION, snapshot.height, snapshot.width, snapshot.turn,
+                              snapshot.is_finished, snapshot.winner, snapshot.longest_ship_sz))
+    writer.write(_SEED.pack(snapshot.seed or 0))
+    layout = CELLS_SPARSE if snapshot.sparse else CELLS_PACKED if offsets is None else CELLS_MAPPED
+    writer.write(bytes([layout, snapshot.seed is not None]))
+    for index, player in enumerate(snapshot.players):
+        if offsets is None:
+            _write_player(writer, player)
+        else:
+            _write_player(writer, player, (offsets[2 * index], offsets[4 + index], offsets[2 * index + 1], NO_CELLS))
+    writer.close()
+
+
+def write_game(game: Game, file) -> None:
+    """
+    writes the game into a binary file object
+    """
+    write_snapshot(Snapshot(game), file)
+
+
+def read_game(file, map_cells=None) -> Game:
+    """
+    reads the game from a binary file object, raises ValueError if it isn't a valid save
+
+    mapped cells are got with map_cells(offset, length)
+    """
+    try:
+        reader = _Reader(file)
+        magic, version, height, width, turn, is_finished, winner, longest_ship_sz = \
+            _HEADER.unpack(reader.read(_HEADER.size))
+        if magic != MAGIC:
+            raise ValueError("not a save of the game")
+        if version not in VERSIONS:
+            raise ValueError(f"unsupported version of the save: {version}")
+        seed = _SEED.unpack(reader.read(_SEED.size))[0] if version >= 2 else None
+        layout = reader.read(1)[0] if version >= 3 else CELLS_PACKED
+        if version >= 5 and not reader.read(1)[0]:
+            seed = None
+        if layout == CELLS_MAPPED and map_cells is None:
+            raise ValueError("cells of the save are stored out of it")
+
+        game = Game(height, width, seed=seed)
+        # games without a seed go on with a random one, but it doesn't repeat them
+        game.seed = seed
+        game.turn = turn
+        game.is_finished = bool(is_finished)
+        game.longest_ship_sz = longest_ship_sz
+        game.players = [_read_player(reader, height, width, game.rng, layout, map_cells) for _ in range(2)]
+    except (zlib.error, struct.error, UnicodeDecodeError, KeyError) as e:
+        raise ValueError(f"the save is corrupted: {e}")
+
+    game.winner = game.players[winner] if winner >= 0 else None
+    for index, player in enumerate(game.players):
+        game.alive_by_size[index] = player.ships.alive_by_size(longest_ship_sz)
+        game.alive_ships[index] = sum(game.alive_by_size[index])
+        game.index_damaged(index)
+    return game
+
+
+def _replay_move(game: Game, shooter: int, y: int, x: int) -> None:
+    """
+    makes the move again
+    """
+    game.turn += (shooter - game.turn) % 2
+    field = game.players[shooter].enemy_field
+    field.y_cur, field.x_cur = y, x
+    _, hit = game.player_shoot()
+    # the same player shoots again after a hit
+    if hit:
+        game.check_victory()
+    else:
+        game.turn += 1
+
+
+def _restore(path: str, move=None) -> Game:
+    """
+    restores the game after the move from the journal, the last saved position if the move isn't given
+    """
+    records = journal.scan(path, head=_MOVE_NUMBER.size)
+    # the latest keyframe before the move
+    start = None
+    for index, record in enumerate(records):
+        if record.type == KEYFRAME and (move is None or _MOVE_NUMBER.unpack(record.head)[0] <= move):
+            start = index
+    if start is None:
+        raise ValueError("the save has no keyframes" if move is None else f"move {move} is before the first keyframe")
+
+    with open(path, 'rb') as file:
+        payload = journal.read(file, records[start])
+        made, = _MOVE_NUMBER.unpack_from(payload)
+        game = read_game(io.BytesIO(payload[_MOVE_NUMBER.size:]),
+                         map_cells=lambda offset, length: journal.map_payload(file, offset, length))
+
+        position = None
+        for record in records[start + 1:]:
+            if record.type == MOVES:
+                payload = journal.read(file, record)
+                first, = _MOVE_NUMBER.unpack_from(payload)
+                for number, (shooter, y, x) in enumerate(_MOVE.iter_unpack(payload[_MOVE_NUMBER.size:]), first):
+                    if number < made:
+                        continue
+                    if move is not None and number >= move:
+                        break
+                    _replay_move(game, shooter, y, x)
+                    made += 1
+            elif record.type == POSITION and move is None:
+                position = journal.read(file, record)
+
+    if position is not None:
+        turn, *windows = _POSITION.unpack(position)
+        game.turn = turn
+        fields = [field for player in game.players for field in (player.my_field, player.enemy_field)]
+        for field, k in zip(fields, range(0, len(windows), 4)):
+            field.y_cur, field.x_cur, field.border_top, field.border_left = windows[k:k + 4]
+
+    game.moves = []
+    game.moves_before = made
+    return game
+
+
+class SlotJournal:
+    """
+    journal of the game saved in a slot
+    """
+
+    def __init__(self, path: str, append: bool):
+        self.path = path
+        self.moves = None  # number of the journaled moves
+        self.keyframe = None  # number of the move of the last keyframe
+        self.ship_ids = None  # offsets of the mapped ship ids written by this journal
+        if append and os.path.exists(path):
+            self._recover()
+        elif os.path.exists(path):
+            os.remove(path)
+
+    def _recover(self) -> None:
+        records = journal.scan(self.path, head=_MOVE_NUMBER.size)
+        # a record torn by a crash is dropped
+        journal.truncate(self.path, records)
+        for record in records:
+            if record.type == KEYFRAME:
+                self.moves = self.keyframe = _MOVE_NUMBER.unpack(record.head)[0]
+            elif record.type == MOVES:
+                first, = _MOVE_NUMBER.unpack(record.head)
+                self.moves = first + (record.length - _MOVE_NUMBER.size) // _MOVE.size
+
+    def write(self, snapshot: Snapshot, first: int, moves) -> None:
+        """
+        appends the moves since the move number first and the position of the snapshot
+        """
+        records = []
+        made, keyframe = self.moves, self.keyframe
+        if made is not None and made < first:
+            raise ValueError(f"moves from {made} to {first} weren't journaled")
+        if made is None:
+            # the journal starts with the initial fleets if all the moves are known
+            start = snapshot.initial() if first == 0 else snapshot
+            records.append((KEYFRAME, self._keyframe(start)))
+            made = keyframe = start.moves
+
+        new = moves[made - first:]
+        if new:
+            records.append((MOVES, _MOVE_NUMBER.pack(made) + b''.join(_MOVE.pack(*move) for move in new)))
+            made += len(new)
+
+        if made - keyframe >= max(KEYFRAME_MOVES, snapshot.height * snapshot.width // 50):
+            records.append((KEYFRAME, self._keyframe(snapshot)))
+            keyframe = made
+
+        records.append((POSITION, snapshot.position()))
+        journal.append(self.path, records)
+        self.moves, self.keyframe = made, keyframe
+
+    def _keyframe(self, snapshot: Snapshot) -> bytes:
+        """
+        returns payload of the keyframe record, mapped cells are appended to the journal before it
+        """
+        if not snapshot.mapped:
+            return snapshot.keyframe()
+        records = [(CELLS, states) for states in snapshot.mapped_states()]
+        if self.ship_ids is None:
+            records += [(CELLS, ship_ids) for ship_ids in snapshot.mapped_ship_ids()]
+        offsets = journal.append(self.path, records, aligned=(CELLS,))
+        if self.ship_ids is None:
+            self.ship_ids = offsets[4:]
+        return snapshot.keyframe(offsets[:4] + self.ship_ids)
+
+
+# the index is read and rewritten by both the game and the autosave threads
+_index_lock = threading.Lock()
+
+
+def _slot_path(slot: str, directory: str) -> str:
+    return os.path.join(directory, slot + '.journal')
+
+
+def read_index(directory: str = SAVES_PATH):
+    """
+    returns metadata of the saves, the latest ones first
+    """
+    try:
+        with open(os.path.join(directory, INDEX_NAME)) as index:
+            saves = json.load(index)
+    except (OSError, ValueError):
+        return []
+    return sorted(saves, key=lambda save: save['timestamp'], reverse=True)
+
+
+def _update_index(snapshot: Snapshot, slot: str, directory: str) -> None:
+    path = os.path.join(directory, INDEX_NAME)
+    with _index_lock:
+        saves = [save for save in read_index(directory) if save['slot'] != slot]
+        saves.append(snapshot.metadata(slot))
+        # the old index is replaced only when the new one is completely written
+        with open(path + '.tmp', 'w') as index:
+            json.dump(saves, index, indent=2)
+        os.replace(path + '.tmp', path)
+
+
+def new_slot(directory: str = SAVES_PATH) -> str:
+    """
+    returns a name of an unused slot
+    """
+    numbers = [int(save['slot']) for save in read_index(directory) if save['slot'].isdigit()]
+    return str(max(numbers, default=0) + 1)
+
+
+def save_game(game: Game, slot: str, directory: str = SAVES_PATH) -> None:
+    """
+    function for saving the game
+
+    the slot is written from scratch, by default saves are located in ./saves folder
+    """
+    with profiling.timed('save'):
+        os.makedirs(directory, exist_ok=True)
+        snapshot = Snapshot(game)
+        SlotJournal(_slot_path(slot, directory), append=False).write(snapshot, game.moves_before, game.moves)
+        _update_index(snapshot, slot, directory)
+
+
+def load_game(slot: str, directory: str = SAVES_PATH):
+    """
+    returns the game saved in the slot, None if there is no such save
+
+    raises ValueError if the save can't be read
+    """
+    path = _slot_path(slot, directory)
+
+    # check if the file exists
+    if not os.path.exists(path):
+        return None
+
+    with profiling.timed('load'):
+        return _restore(path)
+
+
+def seek_game(slot: str, move: int, directory: str = SAVES_PATH) -> Game:
+    """
+    returns the game saved in the slot as it was after the move
+
+    the game is restored from the closest keyframe, the moves before the first keyframe can't be reached
+    """
+    return _restore(_slot_path(slot, directory), move)
+
+
+class SaveWorker:
+    """
+    writes snapshots of games on a background thread
+
+    if a slot is saved again before its previous snapshot was written,
+    only the latest snapshot is written. The moves of a snapshot which failed to be written are kept
+    and written with the next snapshot of the slot, its journal is opened again to drop a torn record
+    """
+
+    def __init__(self, directory: str = SAVES_PATH, loaded_slot=None):
+        self.directory = directory
+        self.loaded_slot = loaded_slot  # the slot the game was loaded from, it's appended to
+        self.pending = {}  # slot -> (snapshot, number of the first move, moves) waiting to be written
+        self.submitted = {}  # slot -> number of the moves submitted
+        self.journals = {}  # slot -> its journal, used by the background thread only
+        self.opened = set()  # slots whose journals were opened, they are appended to when opened again
+        self.failed = {}  # slot -> (number of the first move, moves) of the snapshot which failed to be written
+        self.error = None  # the last error of writing a save, it's reset when taken
+        self.writing = False  # a snapshot is being written
+        self.closed = False
+        self.condition = threading.Condition()
+        self.thread = threading.Thread(target=self._run, name='save worker', daemon=True)
+        self.thread.start()
+
+    def submit(self, game: Game, slot: str) -> None:
+        """
+        takes a snapshot of the game, it's written to the slot later
+        """
+        with profiling.timed('save.snapshot'):
+            snapshot = Snapshot(game)
+        first = self.submitted.get(slot, game.moves_before)
+        moves = game.moves[first - game.moves_before:]
+        self.submitted[slot] = snapshot.moves
+
+        with self.condition:
+            # the moves of the snapshot which hasn't been written yet are kept
+            if slot in self.pending:
+                _, first, earlier = self.pending[slot]
+                moves = earlier + moves
+            elif slot in self.failed:
+                first, earlier = self.failed.pop(slot)
+                moves = earlier + moves
+            self.pending[slot] = snapshot, first, moves
+            self.condition.notify_all()
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if not self.pending:
+                    return
+                slot, (snapshot, first, moves) = self.pending.popitem()
+                self.writing = True
+
+            try:
+                if slot not in self.journals:
+                    os.makedirs(self.directory, exist_ok=True)
+                    self.journals[slot] = SlotJournal(_slot_path(slot, self.directory),
+                                                      append=slot == self.loaded_slot or slot in self.opened)
+                    self.opened.add(slot)
+                with profiling.timed('save.write'):
+                    self.journals[slot].write(snapshot, first, moves)
+                    _update_index(snapshot, slot, self.directory)
+            except (OSError, ValueError) as e:
+                with self.condition:
+                    self.error = e
+                    # the journal may end with a torn record, it's dropped when the journal is opened again
+                    self.journals.pop(slot, None)
+                    if slot in self.pending:
+                        snapshot, _, later = self.pending[slot]
+                        self.pending[slot] = snapshot, first, moves + later
+                    else:
+                        self.failed[slot] = first, moves
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+    def take_error(self):
+        """
+        returns the last error of writing a save and forgets it, None if the saves were written
+        """
+        with self.condition:
+            error, self.error = self.error, None
+        return error
+
+    def flush(self) -> None:
+        """
+        waits until all the submitted snapshots are written or failed to be written
+        """
+        with self.condition:
+            while self.pending or self.writing:
+                self.condition.wait()
+
+    def close(self) -> None:
+        """
+        waits until all the submitted snapshots are written
+        """
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+        self.thread.join()
@@ -0,0 +1,26 @@
+class Style:
+    """
+    symbols the cells are drawn with
+
+    symbols are as wide as the widest column number, so the numbers above the columns fit.
+    Every renderer has its own style, games of different sizes don't affect each other
+    """
+
+    def __init__(self, width: int = 3):
+        self.width = width  # length of the symbols
+        self.empty = ' ' * width
+        self.doesnt_exist = '/' * width
+        self.ship = '▩' * width
+        self.cursor = '□' * width
+        # every symbol fills the whole cell, the renderer only overwrites what has changed
+        self.shot_miss = (' ' * (width // 2) + '⊙').ljust(width)
+        self.shot_hit = (' ' * (width // 2) + '⚔').ljust(width)
+        # symbols indexed by states of the cells
+        self.glyphs = self.empty, self.ship, self.shot_miss, self.shot_hit, self.doesnt_exist
+
+    @staticmethod
+    def for_map(map_width: int):
+        """
+        returns the style matching the field's width
+        """
+        return Style(len(str(map_width)))
@@ -0,0 +1,60 @@
+"""
+checks that games of different sizes played in one interpreter at once don't affect each other
+"""
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'battleships'))
+
+from game import Game  # noqa: E402
+from style import Style  # noqa: E402
+
+GAMES = 200
+ROUNDS = 30
+SEED = 20
+
+
+def new_game(i: int):
+    # heights and widths from 5 to 100, so the games have symbols of widths 1, 2 and 3
+    game = Game(5 + i * 7 % 96, 5 + i % 96, seed=SEED + i)
+    game.prepare_game(player_name="test", player_strategy='random')
+    return game, Style.for_map(game.map_width)
+
+
+def play_round(game: Game, style: Style):
+    """
+    makes a move and returns the frame of both windows
+    """
+    if not game.is_finished:
+        _, hit = game.ai_shoot()
+        if hit:
+            game.check_victory()
+        else:
+            game.turn += 1
+    my_coords, enemy_coords = game.display_field(sheight=50, swidth=160, style=style)
+    return list(my_coords), list(enemy_coords)
+
+
+class ManyGamesTest(unittest.TestCase):
+    def test_interleaved_games_match_games_played_alone(self):
+        games = [new_game(i) for i in range(GAMES)]
+        self.assertGreater(len({style.width for _, style in games}), 1)
+
+        # a round makes a move in every game
+        interleaved = [[] for _ in games]
+        for _ in range(ROUNDS):
+            for frames, (game, style) in zip(interleaved, games):
+                frames.append(play_round(game, style))
+
+        for i, frames in enumerate(interleaved):
+            game, style = new_game(i)
+            alone = [play_round(game, style) for _ in range(ROUNDS)]
+            self.assertEqual(frames, alone, f"game {i} differs from the same game played alone")
+            for my_coords, enemy_coords in frames:
+                for _, _, symbol in my_coords + enemy_coords:
+                    self.assertEqual(len(symbol), style.width, f"a symbol of game {i} has a wrong width")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+"""
+checks that frames drawn incrementally look the same as frames drawn from scratch
+"""
+from unittest import mock
+import importlib.util
+import os
+import sys
+import unittest
+
+PACKAGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'battleships')
+sys.path.insert(0, PACKAGE)
+
+from game import Game  # noqa: E402
+from renderer import Renderer  # noqa: E402
+from style import Style  # noqa: E402
+
+# the drawing functions live in the entry point of the game
+_spec = importlib.util.spec_from_file_location('battleships_main', os.path.join(PACKAGE, '__main__.py'))
+main = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(main)
+
+
+class FakeScreen:
+    """
+    screen keeping the characters drawn on it, one column per character
+    """
+
+    def __init__(self, height: int = 80, width: int = 170):
+        self.height = height
+        self.width = width
+        self.rows = None
+        self.erase()
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def erase(self) -> None:
+        self.rows = [[' '] * self.width for _ in range(self.height)]
+
+    def addstr(self, y: int, x: int, text: str) -> None:
+        for i, symbol in enumerate(text):
+            if 0 <= x + i < self.width:
+                self.rows[y][x + i] = symbol
+
+    def noutrefresh(self) -> None:
+        pass
+
+    def text(self) -> str:
+        return '\n'.join(''.join(row) for row in self.rows)
+
+
+def draw_from_scratch(game: Game, width: int) -> str:
+    screen = FakeScreen()
+    main.display_game(Renderer(screen, Style.for_map(width)), game.players[0], game)
+    return screen.text()
+
+
+@mock.patch('curses.doupdate')
+class IncrementalFrameTest(unittest.TestCase):
+    def check_shots(self, width: int) -> None:
+        game = Game(20, width, seed=1)
+        game.prepare_game(player_name='p')
+        screen = FakeScreen()
+        renderer = Renderer(screen, Style.for_map(width))
+        main.display_game(renderer, game.players[0], game)
+
+        enemy_field = game.players[0].enemy_field
+        ship = game.players[1].my_field.ships[0]
+        # a hit, then misses and cursor moves over the shot cells
+        targets = [(ship.y, ship.x), (0, 0), (0, 2), (1, 1)]
+        for y, x in targets:
+            game.turn = 0
+            enemy_field.y_cur, enemy_field.x_cur = y, x
+            game.player_shoot()
+            for dx in (0, 1, 1, -1):
+                enemy_field.x_cur = min(max(enemy_field.x_cur + dx, 0), width - 1)
+                main.display_game(renderer, game.players[0], game)
+                self.assertEqual(screen.text(), draw_from_scratch(game, width),
+                                 f"the frame differs after the shot at {(y, x)}")
+
+    def test_narrow_symbols(self, _):
+        self.check_shots(20)
+
+    def test_wide_symbols(self, _):
+        self.check_shots(150)
+
+    def test_widest_symbols(self, _):
+        self.check_shots(5000)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,239 @@
+"""
+checks that saved games are loaded as they were saved
+"""
+import contextlib
+import errno
+import io
+import mmap
+import os
+import sys
+import tempfile
+import unittest
+import zlib
+from unittest import mock
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'battleships'))
+
+from field import Field  # noqa: E402
+from game import Game  # noqa: E402
+import journal  # noqa: E402
+import storage  # noqa: E402
+
+
+def new_game(height: int, width: int, seed: int) -> Game:
+    game = Game(height, width, seed=seed)
+    game.prepare_game(player_name="test", player_strategy='random')
+    return game
+
+
+def play(game: Game, moves: int) -> None:
+    for _ in range(moves):
+        if game.is_finished:
+            return
+        _, hit = game.ai_shoot()
+        if hit:
+            game.check_victory()
+        else:
+            game.turn += 1
+
+
+def state(game: Game):
+    """
+    returns everything a save should keep
+    """
+    players = []
+    for player in game.players:
+        fleet = player.my_field.ships
+        fields = [dict(field.shots) if field.is_sparse else bytes(field.states)
+                  for field in (player.my_field, player.enemy_field)]
+        players.append((player.name, player.is_human, list(fleet.rows()), fields))
+    winner = game.players.index(game.winner) if game.winner else None
+    return game.turn, game.is_finished, winner, game.alive_ships, game.alive_by_size, players
+
+
+def older(save: bytes, version: int) -> bytes:
+    """
+    returns the packed save in the format of the older version
+    """
+    data = bytearray(zlib.decompress(save))
+    data[4:6] = version.to_bytes(2, 'little')
+    seed = storage._HEADER.size
+    # the header loses the has seed byte (version 5), the layout byte (3) and the seed (2) going back in versions
+    if version < 5:
+        del data[seed + 8 * (version >= 2) + (version >= 3):seed + 10]
+    return zlib.compress(bytes(data))
+
+
+class FormatTest(unittest.TestCase):
+    def round_trip(self, game: Game) -> Game:
+        file = io.BytesIO()
+        storage.write_game(game, file)
+        file.seek(0)
+        return storage.read_game(file)
+
+    def test_packed_game_is_read_as_written(self):
+        game = new_game(30, 40, seed=3)
+        play(game, 300)
+        loaded = self.round_trip(game)
+        self.assertEqual(state(loaded), state(game))
+        self.assertEqual(loaded.seed, 3)
+        # any hit cell of a damaged ship will do
+        self.assertEqual([damaged.keys() for damaged in loaded.damaged], [damaged.keys() for damaged in game.damaged])
+
+    def test_sparse_game_is_read_as_written(self):
+        with mock.patch.object(Field, 'SPARSE_CELLS', 100):
+            game = new_game(30, 40, seed=4)
+            play(game, 300)
+            loaded = self.round_trip(game)
+        self.assertTrue(loaded.players[0].my_field.is_sparse)
+        self.assertEqual(state(loaded), state(game))
+
+    def test_game_without_seed_is_read_without_it(self):
+        game = new_game(10, 10, seed=5)
+        game.seed = None
+        self.assertIsNone(self.round_trip(game).seed)
+
+    def test_older_versions_are_read(self):
+        game = new_game(12, 17, seed=6)
+        play(game, 60)
+        file = io.BytesIO()
+        storage.write_game(game, file)
+        for version in storage.VERSIONS[:-1]:
+            with self.subTest(version=version):
+                loaded = storage.read_game(io.BytesIO(older(file.getvalue(), version)))
+                self.assertEqual(state(loaded), state(game))
+                # saves before version 2 have no seed
+                self.assertEqual(loaded.seed, None if version == 1 else 6)
+
+    def test_broken_saves_are_refused(self):
+        file = io.BytesIO()
+        storage.write_game(new_game(10, 10, seed=7), file)
+        save = file.getvalue()
+        for broken in (b'', zlib.compress(b'PKL0' + bytes(40)), save[:len(save) // 2], older(save, 99)):
+            with self.assertRaises(ValueError):
+                storage.read_game(io.BytesIO(broken))
+
+
+# layouts of the cells of the saves, small fields are made sparse or mapped by lowering the limits
+LAYOUTS = {
+    'packed': contextlib.nullcontext,
+    'sparse': lambda: mock.patch.object(Field, 'SPARSE_CELLS', 100),
+    'mapped': lambda: mock.patch.object(storage, 'MAPPED_CELLS', 100),
+}
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_games_are_loaded_as_saved(self):
+        for name in LAYOUTS:
+            with self.subTest(layout=name), LAYOUTS[name]():
+                game = new_game(30, 40, seed=8)
+                saver = storage.SaveWorker(self.directory)
+                for _ in range(5):
+                    play(game, 70)
+                    saver.submit(game, name)
+                    saver.flush()
+                saver.close()
+                self.assertIsNone(saver.take_error())
+
+                loaded = storage.load_game(name, self.directory)
+                self.assertEqual(loaded.moves_before, 350)
+                self.assertEqual(state(loaded), state(game))
+                self.assertEqual(loaded.players[0].my_field.is_sparse, name == 'sparse')
+                states = getattr(loaded.players[0].my_field, 'states', None)
+                self.assertEqual(isinstance(states, mmap.mmap), name == 'mapped')
+
+                # a slot saved from scratch is loaded the same way
+                storage.save_game(game, name + '-copy', self.directory)
+                self.assertEqual(state(storage.load_game(name + '-copy', self.directory)), state(game))
+
+    def test_seek_matches_the_game_played_again(self):
+        for name in LAYOUTS:
+            with self.subTest(layout=name), LAYOUTS[name](), mock.patch.object(storage, 'KEYFRAME_MOVES', 25):
+                game = new_game(30, 30, seed=9)
+                saver = storage.SaveWorker(self.directory)
+                for _ in range(20):
+                    play(game, 10)
+                    saver.submit(game, name)
+                saver.close()
+
+                for move in (0, 1, 24, 25, 37, 100, 163, 200):
+                    again = new_game(30, 30, seed=9)
+                    play(again, move)
+                    sought = storage.seek_game(name, move, self.directory)
+                    self.assertEqual(sought.moves_before, move)
+                    self.assertEqual(state(sought), state(again), f"move {move}")
+
+    def test_torn_record_is_dropped(self):
+        game = new_game(30, 30, seed=10)
+        saver = storage.SaveWorker(self.directory)
+        for _ in range(2):
+            play(game, 50)
+            saver.submit(game, 'slot')
+            saver.flush()
+        saver.close()
+
+        # a crash tears the record of the last 50 moves
+        path = os.path.join(self.directory, 'slot.journal')
+        records = journal.scan(path)
+        self.assertEqual([record.type for record in records[-2:]], [storage.MOVES, storage.POSITION])
+        os.truncate(path, records[-2].offset + 10)
+
+        loaded = storage.load_game('slot', self.directory)
+        again = new_game(30, 30, seed=10)
+        play(again, 50)
+        self.assertEqual(loaded.moves_before, 50)
+        self.assertEqual(state(loaded), state(again))
+
+        # the game goes on in the same slot after the torn record
+        saver = storage.SaveWorker(self.directory, loaded_slot='slot')
+        play(loaded, 30)
+        saver.submit(loaded, 'slot')
+        saver.close()
+        self.assertIsNone(saver.take_error())
+        reloaded = storage.load_game('slot', self.directory)
+        self.assertEqual(reloaded.moves_before, 80)
+        self.assertEqual(state(reloaded), state(loaded))
+
+
+class SaveWorkerTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def test_failed_write_is_written_with_the_next_save(self):
+        game = new_game(30, 30, seed=11)
+        saver = storage.SaveWorker(self.directory)
+        saver.submit(game, 'slot')
+        saver.flush()
+        play(game, 50)
+
+        def torn_append(path, records, aligned=()):
+            with open(path, 'ab') as file:
+                file.write(b'\x02\xff')
+            raise OSError(errno.ENOSPC, "no space left on device")
+
+        # the journal is torn by a write which runs out of space
+        with mock.patch('journal.append', torn_append):
+            saver.submit(game, 'slot')
+            saver.flush()
+        self.assertIsInstance(saver.take_error(), OSError)
+        self.assertIsNone(saver.take_error())
+
+        play(game, 50)
+        saver.submit(game, 'slot')
+        saver.close()
+        self.assertIsNone(saver.take_error())
+
+        loaded = storage.load_game('slot', self.directory)
+        self.assertEqual(loaded.moves_before, 100)
+        self.assertEqual(state(loaded), state(game))
+
+
+if __name__ == '__main__':
+    unittest.main()